@@ -2,7 +2,7 @@
 import os
 import sys
 import requests
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse
 import argparse
 import re
 import subprocess
@@ -13,7 +13,484 @@ import json
 import platform
 import sqlite3
 import tempfile
+import hashlib
+import math
+import threading
+import queue
+from collections import deque, namedtuple
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15'
+
+DEFAULT_POOL_SIZE = 10  # Connections kept open per host
+POOL_HOSTS = 32  # Hosts whose connection pools are cached
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = (10, 60)  # Connect and read timeouts in seconds
+COOKIE_TTL = 3600  # Seconds before extracted browser cookies are refreshed
+
+# Per-thread state: the active Downloader and the cancel event of the
+# current job (the daemon attaches one to each job).
+_thread_state = threading.local()
+
+class DownloadCancelled(BaseException):
+    """
+    Raised inside a download when its job has been cancelled.
+
+    Derives from BaseException so the broad ``except Exception`` retry
+    handlers in the download functions do not swallow it.
+    """
+
+def set_cancel_event(event):
+    """
+    Attach a cancel event to downloads running on the current thread.
+    
+    Args:
+        event (threading.Event): Event that is set to cancel, or None to clear
+    """
+    _thread_state.cancel_event = event
+
+def check_cancelled():
+    """
+    Raise DownloadCancelled if the current thread's job has been cancelled.
+    """
+    event = getattr(_thread_state, 'cancel_event', None)
+    if event is not None and event.is_set():
+        raise DownloadCancelled("Download cancelled")
+
+# HTTP client errors that can succeed later: timeout, too early, rate limited
+RETRYABLE_CLIENT_ERRORS = (408, 425, 429)
+# yt-dlp errors that retrying the same URL will not fix. YouTube's 403s are
+# often throttling or an expired signature, so they stay retryable.
+PERMANENT_YTDLP_ERRORS = re.compile(
+    r'HTTP Error 4(?!03|08|25|29)\d\d|Video unavailable|Private video|Unsupported URL|'
+    r'This video has been removed|is not a valid URL'
+)
+
+def is_permanent_status(status):
+    """Whether an HTTP status means the request will keep failing when retried."""
+    return 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS
+
+def _report_error(message, permanent=False):
+    """
+    Print a download error and remember it as the thread's last_error().
+    
+    Args:
+        message (str): The error
+        permanent (bool): Retrying the same download will not help
+    """
+    print(message)
+    _thread_state.last_error = message
+    _thread_state.last_error_permanent = permanent
+
+def _is_permanent_error(error):
+    response = getattr(error, 'response', None)
+    return isinstance(error, requests.HTTPError) and response is not None and \
+        is_permanent_status(response.status_code)
+
+def last_error():
+    """
+    Return the most recent download error reported on the current thread.
+    
+    The download functions print errors and return None, so callers that
+    record failures (job queues, the daemon) read the reason from here.
+    
+    Returns:
+        str: The error message, or None if nothing failed since clear_last_error()
+    """
+    return getattr(_thread_state, 'last_error', None)
+
+def last_error_permanent():
+    """
+    Whether the thread's last_error() is permanent, such as an HTTP 404, so
+    the job should not be retried.
+    
+    Returns:
+        bool: True for permanent errors
+    """
+    return getattr(_thread_state, 'last_error_permanent', False)
+
+def clear_last_error():
+    _thread_state.last_error = None
+    _thread_state.last_error_permanent = False
+
+class _PoolAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to requests that set none."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+class Downloader:
+    """
+    Download engine holding the warm state that repeated downloads share.
+
+    All threads share one HTTP connection pool with keep-alive, a per-host
+    pool size, retries with backoff and default timeouts, so repeated
+    downloads from the same CDN reuse their TCP/TLS connections. Each thread
+    gets its own requests.Session mounted on that pool, because sessions are
+    not thread-safe. Tool paths are resolved once, and browser cookies are
+    re-extracted only after ``cookie_ttl`` seconds. The download methods run
+    the module-level functions with this instance's pool and defaults; an
+    instance can be used from many threads at once.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT,
+                 user_agent=DEFAULT_USER_AGENT, use_cookies=False, cookie_file=None,
+                 cookie_ttl=COOKIE_TTL, policy=None):
+        """
+        Args:
+            pool_size (int): Connections kept open per host
+            retries (int): Retries for connection errors and 429/5xx responses
+            timeout (tuple): (connect, read) timeout in seconds for requests that set none
+            user_agent (str): User-Agent header for every request
+            use_cookies (bool): Extract browser cookies once and reuse them for YouTube
+            cookie_file (str, optional): Cookie file to use instead of extracting one
+            cookie_ttl (float): Seconds before extracted cookies are refreshed
+            policy (FormatPolicy, optional): Default bitrate/codec budget
+        """
+        retry = Retry(
+            total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']), raise_on_status=False
+        )
+        self.adapter = _PoolAdapter(timeout=timeout, pool_connections=POOL_HOSTS,
+                                    pool_maxsize=pool_size, max_retries=retry)
+        self.user_agent = user_agent
+        self.use_cookies = use_cookies
+        self.cookie_ttl = cookie_ttl
+        self.policy = policy
+        self._static_cookie_file = cookie_file
+        self._cookie_file = None
+        self._cookie_time = 0
+        self._cookie_users = {}  # Extracted cookie file -> downloads still using it
+        self._tools = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def session(self):
+        """
+        Get the current thread's session, creating it on first use.
+
+        Returns:
+            requests.Session: A session mounted on the shared connection pool
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': self.user_agent})
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+        return session
+
+    def find_executable(self, *names):
+        """
+        Resolve the first of the given executables on PATH, once per instance.
+
+        Returns:
+            str: Full path of the first executable found, or None
+        """
+        with self._lock:
+            if names not in self._tools:
+                self._tools[names] = next(filter(None, map(shutil.which, names)), None)
+            return self._tools[names]
+
+    def cookie_file(self):
+        """
+        Get the browser cookie file, re-extracting it once it is stale.
+
+        Returns:
+            str: Path to the cookie file or None if unavailable
+        """
+        if self._static_cookie_file or not self.use_cookies:
+            return self._static_cookie_file
+        with self._lock:
+            return self._fresh_cookie_file()
+
+    def _fresh_cookie_file(self):
+        # Called with self._lock held
+        if time.time() - self._cookie_time > self.cookie_ttl:
+            old_file = self._cookie_file
+            self._cookie_file = get_browser_cookies()
+            self._cookie_time = time.time()
+            if old_file and not self._cookie_users.get(old_file):
+                _remove_file(old_file)
+            # Otherwise the last download still using it removes it
+        return self._cookie_file
+
+    @contextmanager
+    def _borrow_cookie_file(self):
+        """
+        Hold the current cookie file for one download. yt-dlp retries and
+        fallbacks re-read it, so a refresh must not delete it meanwhile.
+        """
+        if self._static_cookie_file or not self.use_cookies:
+            yield self._static_cookie_file
+            return
+        with self._lock:
+            path = self._fresh_cookie_file()
+            if path:
+                self._cookie_users[path] = self._cookie_users.get(path, 0) + 1
+        try:
+            yield path
+        finally:
+            if path:
+                with self._lock:
+                    self._cookie_users[path] -= 1
+                    if not self._cookie_users[path]:
+                        del self._cookie_users[path]
+                        if path != self._cookie_file:
+                            _remove_file(path)
+
+    def close(self):
+        """Close pooled connections and delete extracted cookies."""
+        self.adapter.close()
+        with self._lock:
+            for path in {self._cookie_file, *self._cookie_users}:
+                if path:
+                    _remove_file(path)
+            self._cookie_file = None
+            self._cookie_users.clear()
+
+    @contextmanager
+    def activate(self):
+        """Route get_session() and find_executable() on this thread to this instance."""
+        previous = getattr(_thread_state, 'downloader', None)
+        _thread_state.downloader = self
+        try:
+            yield self
+        finally:
+            _thread_state.downloader = previous
+
+    @contextmanager
+    def _defaults(self, options):
+        if options.get('policy') is None:
+            options['policy'] = self.policy
+        if options.get('cookie_file') is not None:
+            yield options
+            return
+        with self._borrow_cookie_file() as cookie_file:
+            options['cookie_file'] = cookie_file
+            yield options
+
+    def download_audio(self, url, output_path=None, **options):
+        """Download audio from any URL; see the module-level download_audio."""
+        with self.activate(), self._defaults(options) as options:
+            return download_audio(url, output_path, **options)
+
+    def download_from_youtube(self, url, output_path=None, **options):
+        """Download audio from YouTube; see the module-level download_from_youtube."""
+        with self.activate(), self._defaults(options) as options:
+            return download_from_youtube(url, output_path, **options)
+
+    def download_audio_range(self, url, output_path=None, start=None, end=None):
+        """Download a section of a direct URL; see the module-level download_audio_range."""
+        with self.activate():
+            return download_audio_range(url, output_path, start, end)
+
+    def sync_audio(self, url, output_path=None, state=None):
+        """Conditionally re-download a direct URL; see the module-level sync_audio."""
+        with self.activate():
+            return sync_audio(url, output_path, state)
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+_default_downloader = None
+_default_lock = threading.Lock()
+
+def get_default_downloader():
+    """
+    Get the process-wide Downloader used by the module-level functions.
+
+    Returns:
+        Downloader: The shared instance, created on first use
+    """
+    global _default_downloader
+    with _default_lock:
+        if _default_downloader is None:
+            _default_downloader = Downloader()
+        return _default_downloader
+
+def _current_downloader():
+    return getattr(_thread_state, 'downloader', None) or get_default_downloader()
+
+def get_session():
+    """
+    Get the HTTP session for the current thread.
+
+    Sessions come from the active Downloader (the default one unless a
+    Downloader method is running), so connections stay warm between downloads.
+
+    Returns:
+        requests.Session: The thread's session
+    """
+    return _current_downloader().session()
+
+def find_executable(*names):
+    """
+    Find the first of the given executables on PATH.
+    
+    Args:
+        *names (str): Candidate executable names, in order of preference
+        
+    Returns:
+        str: Full path of the first executable found, or None
+    """
+    return _current_downloader().find_executable(*names)
+
+class CanonicalURL(namedtuple('CanonicalURL', ['kind', 'id', 'playlist', 'start', 'url'])):
+    """
+    Canonical form of a download URL.
+
+    Fields:
+        kind (str): 'video', 'playlist', 'youtube' (other YouTube page) or 'direct'
+        id (str): YouTube video ID, or None
+        playlist (str): YouTube playlist ID, or None
+        start (int): Start time in seconds from ``t=``/``start=``, or None
+        url (str): Normalized URL with tracking parameters removed
+    """
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """Deduplication key: equal keys download the same content."""
+        if self.kind == 'video':
+            return 'youtube:' + self.id
+        if self.kind == 'playlist':
+            return 'youtube-playlist:' + self.playlist
+        return self.url
+
+# Hosts that serve YouTube pages, mapped to how their path identifies a video
+_YOUTUBE_HOSTS = {
+    'youtube.com': 'path',
+    'www.youtube.com': 'path',
+    'm.youtube.com': 'path',
+    'music.youtube.com': 'path',
+    'youtube-nocookie.com': 'path',
+    'www.youtube-nocookie.com': 'path',
+    'youtu.be': 'short',
+    'www.youtu.be': 'short',
+}
+
+# Path prefixes that carry the video ID as the next path segment
+_YOUTUBE_ID_PATHS = ('shorts', 'embed', 'live', 'v', 'e')
+
+# Tracking and position parameters that do not change which page is meant
+_YOUTUBE_NOISE_PARAMS = ('si', 't', 'feature')
+
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+_URL_RE = re.compile(r'^(?:([A-Za-z][A-Za-z0-9+.-]*):)?//([^/?#]*)([^?#]*)(?:\?([^#]*))?(?:#(.*))?$')
+_VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_TIME_RE = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?$')
+
+def _parse_start_time(value):
+    """Parse a ``t=`` value such as ``90``, ``90s`` or ``1h2m3s`` into seconds."""
+    match = _TIME_RE.match(value) if value else None
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+def canonicalize_url(url):
+    """
+    Parse a URL into its canonical form.
+    
+    Understands youtube.com, m.youtube.com, music.youtube.com, youtu.be and
+    youtube-nocookie.com links in /watch, /shorts/, /embed/, /live/, /v/ and
+    /playlist form, and drops noise such as ``si=`` and ``t=``.
+    
+    Args:
+        url (str): The URL to canonicalize
+        
+    Returns:
+        CanonicalURL: The canonical record
+    """
+    url = url.strip()
+    match = _URL_RE.match(url if '//' in url[:12] else '//' + url)
+    if not match:
+        return CanonicalURL('direct', None, None, None, url)
+    scheme, netloc, path, query, fragment = match.groups()
+    scheme = (scheme or 'https').lower()
+    userinfo, _, host = netloc.rpartition('@')
+    host = host.lower()
+    if ':' in host and not host.endswith(']'):
+        host, _, port = host.rpartition(':')
+        if port not in ('', _DEFAULT_PORTS.get(scheme)):
+            host = f"{host}:{port}"
+
+    style = _YOUTUBE_HOSTS.get(host)
+    if style is None:
+        # Credentials are part of what a direct URL fetches, so they are kept
+        authority = f"{userinfo}@{host}" if userinfo else host
+        normalized = f"{scheme}://{authority}{path or '/'}" + (f"?{query}" if query else '')
+        return CanonicalURL('direct', None, None, None, normalized)
+
+    params = {}
+    if query:
+        for pair in query.split('&'):
+            name, _, value = pair.partition('=')
+            params.setdefault(name, value)
+    if fragment and fragment.startswith('t='):
+        params.setdefault('t', fragment[2:])
+
+    segments = [segment for segment in path.split('/') if segment]
+    video_id = None
+    if style == 'short':
+        video_id = segments[0] if segments else None
+    elif segments and segments[0] == 'watch':
+        video_id = params.get('v')
+    elif len(segments) >= 2 and segments[0] in _YOUTUBE_ID_PATHS:
+        video_id = segments[1]
+
+    playlist = params.get('list') or None
+    start = _parse_start_time(params.get('t') or params.get('start'))
+    if video_id and _VIDEO_ID_RE.match(video_id):
+        canonical = f"https://www.youtube.com/watch?v={video_id}"
+        if playlist:
+            canonical += f"&list={playlist}"
+        return CanonicalURL('video', video_id, playlist, start, canonical)
+    if playlist:
+        return CanonicalURL('playlist', None, playlist, None,
+                            f"https://www.youtube.com/playlist?list={playlist}")
+    if not segments:
+        # A bare YouTube host is not something we can download
+        return CanonicalURL('direct', None, None, None, f"{scheme}://{host}/")
+    # Other YouTube pages (channels, search, ...) keep their meaningful parameters
+    kept = [pair for pair in (query or '').split('&')
+            if pair and pair.partition('=')[0] not in _YOUTUBE_NOISE_PARAMS]
+    return CanonicalURL('youtube', None, None, None,
+                        f"https://www.youtube.com{path}" + (f"?{'&'.join(kept)}" if kept else ''))
+
+def dedupe_urls(urls):
+    """
+    Remove URLs that canonicalize to content already in the list.
+    
+    Args:
+        urls (iterable): URLs, or tuples whose first item is the URL
+        
+    Returns:
+        list: The first occurrence of each distinct item, in input order
+    """
+    seen = set()
+    unique = []
+    for item in urls:
+        key = canonicalize_url(item if isinstance(item, str) else item[0]).key
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
 
 def is_youtube_url(url):
     """
@@ -25,8 +502,7 @@ def is_youtube_url(url):
     Returns:
         bool: True if it's a YouTube URL, False otherwise
     """
-    youtube_regex = r'^(https?://)?(www\.)?(youtube\.com|youtu\.?be)/.+$'
-    return bool(re.match(youtube_regex, url))
+    return canonicalize_url(url).kind != 'direct'
 
 def extract_video_id(url):
     """
@@ -38,24 +514,7 @@ def extract_video_id(url):
     Returns:
         str: The video ID or None if not found
     """
-    # Handle youtu.be URLs
-    if 'youtu.be' in url:
-        path = urlparse(url).path
-        return path.strip('/')
-    
-    # Handle youtube.com URLs
-    parsed_url = urlparse(url)
-    if 'youtube.com' in parsed_url.netloc:
-        if '/watch' in parsed_url.path:
-            return parse_qs(parsed_url.query).get('v', [None])[0]
-        elif '/shorts/' in parsed_url.path:
-            # Extract ID from /shorts/ URL
-            path_parts = parsed_url.path.split('/')
-            for i, part in enumerate(path_parts):
-                if part == 'shorts' and i + 1 < len(path_parts):
-                    return path_parts[i + 1]
-    
-    return None
+    return canonicalize_url(url).id
 
 def get_chrome_cookies():
     """
@@ -262,7 +721,331 @@ def get_browser_cookies():
     
     return cookie_file
 
-def download_with_youtube_dl(url, output_path=None, attempts=3, use_cookies=True):
+def parse_timestamp(value):
+    """
+    Parse a time offset given in seconds or as [[hh:]mm:]ss.
+    
+    Args:
+        value (str, int or float): The offset, e.g. 90, "90.5", "1:30" or "01:01:30"
+        
+    Returns:
+        float: The offset in seconds, or None if value is empty
+        
+    Raises:
+        ValueError: If the value is not a valid offset
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        parts = [float(value)]
+    else:
+        parts = [float(part) for part in str(value).strip().split(':')]
+    for part in parts:
+        if not math.isfinite(part):
+            raise ValueError(f"Invalid time offset: {value}")
+        # Reject each component on its own, so "1:-5" is not read as 55 seconds
+        if part < 0:
+            raise ValueError(f"Negative time offset: {value}")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+def _section_args(start=None, end=None):
+    """Build yt-dlp arguments that download only the given time range."""
+    if start is None and end is None:
+        return []
+    return ["--download-sections", f"*{start or 0}-{'inf' if end is None else end}"]
+
+# Content profiles: the lowest source bitrate (kbps) worth fetching and the
+# MP3 quality passed to yt-dlp when converting
+CONTENT_PROFILES = {
+    'speech': {'min_bitrate': 32, 'audio_quality': '64K'},
+    'music': {'min_bitrate': 128, 'audio_quality': '0'},
+}
+
+# Names users give codecs, mapped to the prefix pytube/yt-dlp report
+_CODEC_ALIASES = {'aac': 'mp4a', 'm4a': 'mp4a'}
+
+class FormatPolicy(namedtuple('FormatPolicy', ['max_bitrate', 'codecs', 'profile'], defaults=(None, (), None))):
+    """
+    Audio format budget for YouTube downloads.
+
+    Fields:
+        max_bitrate (int): Highest source bitrate to fetch in kbps, or None
+        codecs (tuple): Preferred codecs in order, e.g. ('opus', 'mp4a')
+        profile (str): 'speech', 'music' or None for the best available quality
+    """
+    __slots__ = ()
+
+def make_format_policy(max_bitrate=None, codecs=None, profile=None):
+    """
+    Build a FormatPolicy from user input.
+    
+    Args:
+        max_bitrate (int, optional): Highest bitrate in kbps
+        codecs (str or list, optional): Preferred codecs, as a list or comma-separated string
+        profile (str, optional): 'speech' or 'music'
+        
+    Returns:
+        FormatPolicy: The policy, or None if no option was given
+        
+    Raises:
+        ValueError: If an option is invalid
+    """
+    if isinstance(codecs, str):
+        codecs = [codec for codec in codecs.split(',') if codec.strip()]
+    codecs = tuple(_CODEC_ALIASES.get(codec.strip().lower(), codec.strip().lower()) for codec in codecs or ())
+    if profile is not None and profile not in CONTENT_PROFILES:
+        raise ValueError(f"Unknown content profile: {profile}")
+    if max_bitrate is not None:
+        max_bitrate = int(max_bitrate)
+        if max_bitrate <= 0:
+            raise ValueError(f"Invalid bitrate: {max_bitrate}")
+    if max_bitrate is None and not codecs and profile is None:
+        return None
+    return FormatPolicy(max_bitrate, codecs, profile)
+
+def _bitrate_range(policy):
+    """Get the (min, max) source bitrate in kbps a policy allows; either may be None."""
+    floor = CONTENT_PROFILES[policy.profile]['min_bitrate'] if policy.profile else None
+    if floor is not None and policy.max_bitrate is not None:
+        floor = min(floor, policy.max_bitrate)
+    return floor, policy.max_bitrate
+
+def _codec_rank(codec, policy):
+    for rank, preferred in enumerate(policy.codecs):
+        if codec and codec.startswith(preferred):
+            return rank
+    return len(policy.codecs)
+
+def select_audio_stream(streams, policy=None):
+    """
+    Pick a pytube audio-only stream under a format policy.
+    
+    With a bitrate budget (a maximum bitrate or a profile), chooses the
+    smallest stream that meets the profile's minimum bitrate and the maximum
+    bitrate, preferring the policy's codecs. If nothing reaches the minimum,
+    the largest stream under the maximum is used; if everything is over
+    budget, the smallest stream is used. With only codecs, chooses the highest
+    bitrate stream of the most preferred codec available.
+    
+    Args:
+        streams: pytube StreamQuery already filtered to audio-only streams
+        policy (FormatPolicy, optional): The budget; without one the first stream is used
+        
+    Returns:
+        pytube.Stream: The chosen stream, or None if there are no streams
+    """
+    streams = list(streams)
+    if not policy or not streams:
+        return streams[0] if streams else None
+    
+    def bitrate(stream):
+        return int(re.sub(r'\D', '', stream.abr or '') or 0)
+    
+    if policy.max_bitrate is None and not policy.profile:
+        return min(streams, key=lambda stream: (_codec_rank(stream.audio_codec, policy), -bitrate(stream)))
+    floor, ceiling = _bitrate_range(policy)
+    within = [stream for stream in streams if ceiling is None or bitrate(stream) <= ceiling]
+    if not within:
+        print(f"No audio stream within {ceiling} kbps; using the smallest available")
+        return min(streams, key=bitrate)
+    candidates = [stream for stream in within if floor is None or bitrate(stream) >= floor]
+    if not candidates:
+        return max(within, key=bitrate)
+    return min(candidates, key=lambda stream: (_codec_rank(stream.audio_codec, policy), bitrate(stream)))
+
+def _format_args(policy=None, yt_dlp=True):
+    """
+    Build yt-dlp/youtube-dl format selection arguments for a policy.
+    
+    The format spec only ever names audio-only formats (``bestaudio``/
+    ``worstaudio``), so a muxed video stream is never downloaded. With a
+    bitrate budget, yt-dlp sorts formats with ``-S +abr`` so that
+    ``bestaudio`` is the smallest match of each alternative; youtube-dl has
+    no ``-S`` and gets the same choice from ``worstaudio``. With only codecs,
+    the best audio of the first available preferred codec is fetched.
+    
+    Args:
+        policy (FormatPolicy, optional): Bitrate/codec budget
+        yt_dlp (bool): Whether the command is yt-dlp rather than youtube-dl
+    """
+    if not policy:
+        return ["-f", "bestaudio", "--audio-quality", "0"]
+    if policy.max_bitrate is None and not policy.profile:
+        choices = [f"bestaudio[acodec^={codec}]" for codec in policy.codecs] + ["bestaudio"]
+        return ["-f", "/".join(choices), "--audio-quality", "0"]
+    floor, ceiling = _bitrate_range(policy)
+    in_range = (f"[abr>={floor}]" if floor else "") + (f"[abr<=?{ceiling}]" if ceiling else "")
+    under_cap = f"[abr<=?{ceiling}]" if ceiling else ""
+    smallest = "bestaudio" if yt_dlp else "worstaudio"
+    choices = [f"{smallest}[acodec^={codec}]{in_range}" for codec in policy.codecs]
+    choices += [f"{smallest}{in_range}", f"{smallest}{under_cap}", smallest]
+    quality = CONTENT_PROFILES[policy.profile]['audio_quality'] if policy.profile else "0"
+    if ceiling and (quality == "0" or int(quality.rstrip('K')) > ceiling):
+        quality = f"{ceiling}K"
+    sort = ["-S", "+abr"] if yt_dlp else []
+    return ["-f", "/".join(dict.fromkeys(choices)), *sort, "--audio-quality", quality]
+
+STDERR_TAIL_LINES = 50  # stderr lines kept from a yt-dlp run for error reporting
+
+# Machine-readable progress line requested from yt-dlp with --progress-template
+PROGRESS_PREFIX = "[progress]"
+PROGRESS_TEMPLATE = (
+    "download:" + PROGRESS_PREFIX + " %(progress.downloaded_bytes)s %(progress.total_bytes)s "
+    "%(progress.total_bytes_estimate)s %(progress.speed)s %(progress.eta)s"
+)
+
+# Classic "[download]  42.0% of ~3.10MiB at 1.20MiB/s ETA 00:02" lines (youtube-dl)
+_CLASSIC_PROGRESS_RE = re.compile(
+    r'^\[download\]\s+([\d.]+)% of\s+~?\s*([\d.]+)([KMG]?i?B)'
+    r'(?:\s+at\s+([\d.]+)([KMG]?i?B)/s)?(?:\s+ETA\s+([\d:]+))?'
+)
+_SIZE_UNITS = {'B': 1, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'KB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3}
+
+class DownloadProgress(namedtuple('DownloadProgress', ['downloaded', 'total', 'speed', 'eta'])):
+    """
+    Progress of a running download.
+
+    Fields:
+        downloaded (int): Bytes downloaded so far
+        total (int): Expected total bytes, or None if unknown
+        speed (float): Bytes per second, or None
+        eta (float): Seconds remaining, or None
+    """
+    __slots__ = ()
+
+def parse_progress_line(line):
+    """
+    Parse a yt-dlp progress line.
+    
+    Understands the PROGRESS_TEMPLATE format and youtube-dl's classic
+    ``[download]`` lines.
+    
+    Args:
+        line (str): A line of yt-dlp output
+        
+    Returns:
+        DownloadProgress: The parsed progress, or None if the line is not progress
+    """
+    def number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    
+    if line.startswith(PROGRESS_PREFIX):
+        fields = line[len(PROGRESS_PREFIX):].split()
+        if len(fields) != 5:
+            return None
+        downloaded, total, estimate, speed, eta = (number(field) for field in fields)
+        total = total or estimate
+        return DownloadProgress(int(downloaded or 0), int(total) if total else None, speed, eta)
+    
+    match = _CLASSIC_PROGRESS_RE.match(line)
+    if not match:
+        return None
+    percent, size, unit, speed, speed_unit, eta = match.groups()
+    total = float(size) * _SIZE_UNITS.get(unit, 1)
+    if speed:
+        speed = float(speed) * _SIZE_UNITS.get(speed_unit, 1)
+    if eta:
+        eta = float(parse_timestamp(eta))
+    return DownloadProgress(int(total * float(percent) / 100), int(total), speed, eta)
+
+def print_progress(progress):
+    """Print a DownloadProgress in place, like the direct download progress line."""
+    if progress.total:
+        percent = int(100 * progress.downloaded / progress.total)
+        line = f"\rDownloading: {percent}% [{progress.downloaded} / {progress.total} bytes]"
+    else:
+        line = f"\rDownloading: {progress.downloaded} bytes"
+    if progress.speed:
+        line += f" at {progress.speed / 1024:.0f} KiB/s"
+    if progress.eta is not None:
+        line += f", ETA {progress.eta:.0f}s"
+    sys.stdout.write(line)
+    sys.stdout.flush()
+
+def run_youtube_dl(cmd, on_progress=print_progress):
+    """
+    Run a youtube-dl/yt-dlp command, draining stdout and stderr concurrently.
+    
+    Both pipes are read by background threads so a chatty stderr cannot fill
+    its pipe buffer and stall the process. Progress lines are parsed and passed
+    to ``on_progress``; other stdout lines are printed. Output is handled on the
+    calling thread, which also checks for cancellation.
+    
+    Args:
+        cmd (list): The command; yt-dlp gets --newline and a progress template added
+        on_progress (callable, optional): Called with each DownloadProgress
+        
+    Returns:
+        tuple: (exit code, last STDERR_TAIL_LINES lines of stderr as a string)
+    """
+    if os.path.basename(cmd[0]).startswith('yt-dlp'):
+        cmd = [cmd[0], "--newline", "--progress-template", PROGRESS_TEMPLATE] + cmd[1:]
+    else:
+        cmd = [cmd[0], "--newline"] + cmd[1:]
+    
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        bufsize=1
+    )
+    stdout_lines = queue.Queue()
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    
+    def drain_stdout():
+        for line in process.stdout:
+            stdout_lines.put(line)
+        stdout_lines.put(None)
+    
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line.rstrip())
+    
+    readers = [threading.Thread(target=drain_stdout, daemon=True),
+               threading.Thread(target=drain_stderr, daemon=True)]
+    for reader in readers:
+        reader.start()
+    
+    try:
+        in_progress = False
+        while True:
+            check_cancelled()
+            try:
+                line = stdout_lines.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if line is None:
+                break
+            progress = parse_progress_line(line)
+            if progress:
+                if on_progress:
+                    on_progress(progress)
+                    in_progress = True
+            elif line.strip():
+                if in_progress:
+                    # End the in-place progress line first
+                    print()
+                    in_progress = False
+                print(line.strip())
+    except DownloadCancelled:
+        process.terminate()
+        process.wait()
+        raise
+    
+    returncode = process.wait()
+    for reader in readers:
+        reader.join()
+    return returncode, "\n".join(stderr_tail)
+
+def download_with_youtube_dl(url, output_path=None, attempts=3, use_cookies=True, cookie_file=None,
+                             start=None, end=None, policy=None):
     """
     Download audio from a YouTube video using youtube-dl or yt-dlp with multiple attempts.
     
@@ -271,16 +1054,16 @@ def download_with_youtube_dl(url, output_path=None, attempts=3, use_cookies=True
         output_path (str, optional): Path where the audio file should be saved.
         attempts (int): Number of download attempts
         use_cookies (bool): Whether to try using browser cookies
+        cookie_file (str, optional): Existing Netscape cookie file to pass along
+        start (float, optional): Start of the section to download, in seconds
+        end (float, optional): End of the section to download, in seconds
+        policy (FormatPolicy, optional): Bitrate/codec budget for the source stream
     
     Returns:
         str: Path to the downloaded audio file
     """
     # Check if youtube-dl or yt-dlp is installed
-    youtube_dl_cmd = None
-    for cmd in ['yt-dlp', 'youtube-dl']:
-        if shutil.which(cmd):
-            youtube_dl_cmd = cmd
-            break
+    youtube_dl_cmd = find_executable('yt-dlp', 'youtube-dl')
     
     if not youtube_dl_cmd:
         print("Neither yt-dlp nor youtube-dl is installed.")
@@ -313,32 +1096,29 @@ def download_with_youtube_dl(url, output_path=None, attempts=3, use_cookies=True
                 youtube_dl_cmd,
                 "-x",  # Extract audio
                 "--audio-format", "mp3",  # Convert to mp3
-                "--audio-quality", "0",  # Best quality
+                # Audio-only format within the budget
+                *_format_args(policy, yt_dlp=os.path.basename(youtube_dl_cmd).startswith('yt-dlp')),
                 "-o", output_template,  # Output template
                 "--user-agent", user_agent,  # Use a simple user agent
-                url  # URL to download
             ]
             
-            print(f"Downloading audio from YouTube using {youtube_dl_cmd} (Attempt {attempt+1}/{attempts}): {url}")
+            # Only fetch the requested section
+            cmd.extend(_section_args(start, end))
             
-            # Run the command
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
+            # Add cookies if the caller already has them
+            if cookie_file and use_cookies:
+                cmd.extend(["--cookies", cookie_file])
             
-            # Print output in real-time
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    print(output.strip())
+            # Add URL at the end
+            cmd.append(url)
+            
+            print(f"Downloading audio from YouTube using {youtube_dl_cmd} (Attempt {attempt+1}/{attempts}): {url}")
+            
+            # Run the command, printing output and progress in real-time
+            returncode, stderr = run_youtube_dl(cmd)
             
             # Check if the command was successful
-            if process.returncode == 0:
+            if returncode == 0:
                 # Success!
                 if not output_path:
                     print("\nDownload complete!")
@@ -357,8 +1137,10 @@ def download_with_youtube_dl(url, output_path=None, attempts=3, use_cookies=True
                     print(f"\nDownload complete! Audio saved to: {output_path}")
                     return output_path
             else:
-                stderr = process.stderr.read()
-                print(f"Error on attempt {attempt+1}: {stderr}")
+                permanent = bool(PERMANENT_YTDLP_ERRORS.search(stderr))
+                _report_error(f"Error on attempt {attempt+1}: {stderr}", permanent)
+                if permanent:
+                    break
                 
                 # If this is not the last attempt, wait before retrying
                 if attempt < attempts - 1:
@@ -367,7 +1149,7 @@ def download_with_youtube_dl(url, output_path=None, attempts=3, use_cookies=True
                     time.sleep(wait_time)
                     
         except Exception as e:
-            print(f"Error on attempt {attempt+1}: {e}")
+            _report_error(f"Error on attempt {attempt+1}: {e}")
             if attempt < attempts - 1:
                 wait_time = 2 * (attempt + 1)
                 print(f"Retrying in {wait_time} seconds...")
@@ -376,7 +1158,8 @@ def download_with_youtube_dl(url, output_path=None, attempts=3, use_cookies=True
     print("Failed to download after", attempts, "attempts.")
     return None
 
-def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookies=True):
+def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookies=True, cookie_file=None,
+                                   start=None, end=None, policy=None):
     """
     Download audio from a YouTube video using yt-dlp with the embed URL approach.
     This is often more effective for shorts and restricted videos.
@@ -386,16 +1169,17 @@ def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookie
         output_path (str, optional): Path where the audio file should be saved.
         attempts (int): Number of download attempts
         use_cookies (bool): Whether to try using browser cookies
+        cookie_file (str, optional): Existing Netscape cookie file to use instead
+                                     of extracting one; it is left in place.
+        start (float, optional): Start of the section to download, in seconds
+        end (float, optional): End of the section to download, in seconds
+        policy (FormatPolicy, optional): Bitrate/codec budget for the source stream
     
     Returns:
         str: Path to the downloaded audio file
     """
     # Check if yt-dlp is installed
-    youtube_dl_cmd = None
-    for cmd in ['yt-dlp']:
-        if shutil.which(cmd):
-            youtube_dl_cmd = cmd
-            break
+    youtube_dl_cmd = find_executable('yt-dlp')
     
     if not youtube_dl_cmd:
         print("yt-dlp is not installed.")
@@ -414,9 +1198,12 @@ def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookie
     print(f"Using embed URL approach: {embed_url}")
     
     # Try to get cookies from browser if requested
-    cookie_file = None
-    if use_cookies:
+    owns_cookie_file = False
+    if not use_cookies:
+        cookie_file = None
+    elif not cookie_file:
         cookie_file = get_browser_cookies()
+        owns_cookie_file = True
         if cookie_file:
             print(f"Using browser cookies for authentication")
     
@@ -444,7 +1231,7 @@ def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookie
                 youtube_dl_cmd,
                 "-x",  # Extract audio
                 "--audio-format", "mp3",  # Convert to mp3
-                "--audio-quality", "0",  # Best quality
+                *_format_args(policy),  # Audio-only format within the budget
                 "-o", output_template,  # Output template
                 "--user-agent", user_agent,  # Use specific user agent
                 "--referer", "https://www.youtube.com/",  # Set referer
@@ -459,6 +1246,9 @@ def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookie
                 "--no-overwrites",  # Don't overwrite files
             ]
             
+            # Only fetch the requested section
+            cmd.extend(_section_args(start, end))
+            
             # Add cookies if available
             if cookie_file:
                 cmd.extend(["--cookies", cookie_file])
@@ -468,24 +1258,11 @@ def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookie
             
             print(f"Downloading audio using embed URL approach (Attempt {attempt+1}/{attempts}): {embed_url}")
             
-            # Run the command
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            
-            # Print output in real-time
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    print(output.strip())
+            # Run the command, printing output and progress in real-time
+            returncode, stderr = run_youtube_dl(cmd)
             
             # Check if the command was successful
-            if process.returncode == 0:
+            if returncode == 0:
                 # Success!
                 if not output_path:
                     print("\nDownload complete!")
@@ -504,7 +1281,6 @@ def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookie
                     print(f"\nDownload complete! Audio saved to: {output_path}")
                     return output_path
             else:
-                stderr = process.stderr.read()
                 print(f"Error on attempt {attempt+1}: {stderr}")
                 
                 # If this is not the last attempt, wait before retrying
@@ -521,7 +1297,7 @@ def download_with_youtube_dl_embed(url, output_path=None, attempts=3, use_cookie
                 time.sleep(wait_time)
         finally:
             # Clean up cookie file if we created one
-            if cookie_file and os.path.exists(cookie_file) and use_cookies:
+            if cookie_file and os.path.exists(cookie_file) and owns_cookie_file:
                 try:
                     os.unlink(cookie_file)
                 except Exception as e:
@@ -550,10 +1326,7 @@ def try_direct_youtube_download(url, output_path=None):
             return None
             
         # Try to get audio URL (this is a simplified approach and may not work for all videos)
-        session = requests.Session()
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15',
-        })
+        session = get_session()
         
         # This is a very basic approach and will likely not work for most videos
         # due to YouTube's protection mechanisms
@@ -574,7 +1347,12 @@ def try_direct_youtube_download(url, output_path=None):
         print(f"Error in direct download attempt: {e}")
         return None
 
-def download_from_youtube(url, output_path=None):
+def _check_cancelled_progress(stream, chunk, bytes_remaining):
+    # pytube progress callback: lets cancellation interrupt a stream download
+    check_cancelled()
+
+def download_from_youtube(url, output_path=None, cookie_file=None, start=None, end=None, policy=None,
+                          resume=False):
     """
     Try to download audio from a YouTube video using multiple methods.
     
@@ -582,6 +1360,12 @@ def download_from_youtube(url, output_path=None):
         url (str): The YouTube URL
         output_path (str, optional): Path where the audio file should be saved.
                                      If not provided, it will use the video title.
+        cookie_file (str, optional): Existing cookie file for the yt-dlp fallbacks
+        start (float, optional): Start of the section to download, in seconds
+        end (float, optional): End of the section to download, in seconds
+        policy (FormatPolicy, optional): Bitrate/codec budget for the source stream
+        resume (bool): Continue an interrupted download. pytube cannot resume,
+                       so this goes straight to yt-dlp, which picks up its .part file.
     
     Returns:
         str: Path to the downloaded audio file
@@ -590,56 +1374,323 @@ def download_from_youtube(url, output_path=None):
         print(f"Not a YouTube URL: {url}")
         return None
     
-    print(f"Attempting to download with pytube: {url}")
+    if start is None and end is None and not resume:
+        print(f"Attempting to download with pytube: {url}")
+        try:
+            # First try with pytube
+            from pytube import YouTube
+            
+            yt = YouTube(url, on_progress_callback=_check_cancelled_progress)
+            audio_stream = select_audio_stream(yt.streams.filter(only_audio=True), policy)
+            
+            if not audio_stream:
+                raise Exception("No audio stream found")
+            print(f"Selected {audio_stream.audio_codec} stream at {audio_stream.abr}")
+            
+            partial_file = audio_stream.get_file_path(output_path)
+            try:
+                if output_path:
+                    # If output_path is specified, use it directly
+                    out_file = audio_stream.download(filename=output_path)
+                else:
+                    # Otherwise, download to a temporary file
+                    out_file = audio_stream.download()
+            except DownloadCancelled:
+                # A leftover partial file would look finished to a resumed yt-dlp run
+                _remove_file(partial_file)
+                raise
+            
+            # If the file is not already an MP3, convert it
+            base, ext = os.path.splitext(out_file)
+            if ext.lower() != '.mp3':
+                mp3_file = base + '.mp3'
+                os.rename(out_file, mp3_file)
+                out_file = mp3_file
+            
+            print(f"Download complete! Audio saved to: {out_file}")
+            return out_file
+            
+        except Exception as e:
+            print(f"Error with pytube: {e}")
+            print("Falling back to youtube-dl/yt-dlp...")
+    elif start is None and end is None:
+        print("Resuming with yt-dlp...")
+    else:
+        # pytube can only fetch whole streams; yt-dlp downloads just the section
+        print(f"Downloading section {start or 0}s-{'end' if end is None else f'{end}s'} with yt-dlp...")
+    
+    # Try with youtube-dl/yt-dlp
+    result = download_with_youtube_dl(url, output_path, cookie_file=cookie_file, start=start, end=end,
+                                      policy=policy)
+    
+    if result:
+        return result
+    
+    # If youtube-dl fails, try with embed URL approach
+    print("Trying embed URL approach...")
+    result = download_with_youtube_dl_embed(url, output_path, cookie_file=cookie_file, start=start, end=end,
+                                            policy=policy)
+    
+    if result:
+        return result
+    
+    # The direct method cannot download sections
+    if start is not None or end is not None:
+        return None
+    
+    # If all else fails, try direct download
+    print("Trying direct download as a last resort...")
+    return try_direct_youtube_download(url, output_path)
+
+RANGE_PADDING = 5  # Seconds fetched on either side of an estimated byte range
+# Frame-based formats that can be decoded from an arbitrary byte window
+RANGE_SEEKABLE_FORMATS = ('mp3', 'aac')
+
+def _copy_response(response, f, total_size=0, downloaded=0):
+    """
+    Stream a response body into a writable object, printing progress.
+    
+    Args:
+        response (requests.Response): A streaming response
+        f: Object with a write() method (a file or an output sink writer)
+        total_size (int): Expected number of bytes, or 0 if unknown
+        downloaded (int): Bytes already present when resuming
+    """
+    chunk_size = 8192
+    
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        check_cancelled()
+        if chunk:
+            f.write(chunk)
+            downloaded += len(chunk)
+            
+            # Calculate and display progress
+            if total_size > 0:
+                percent = int(100 * downloaded / total_size)
+                sys.stdout.write(f"\rDownloading: {percent}% [{downloaded} / {total_size} bytes]")
+                sys.stdout.flush()
+
+def _save_response(response, output_path, total_size=0, offset=0):
+    """
+    Stream a response body to a file, printing progress.
+    
+    Args:
+        response (requests.Response): A streaming response
+        output_path (str): File to write
+        total_size (int): Expected number of bytes, or 0 if unknown
+        offset (int): Append to the first ``offset`` bytes already in the file
+    """
+    with open(output_path, 'ab' if offset else 'wb') as f:
+        if offset:
+            f.truncate(offset)
+        _copy_response(response, f, total_size, offset)
+
+def probe_media(url):
+    """
+    Read the duration and container format of a media file or URL with ffprobe.
+    
+    Args:
+        url (str): The file path or URL
+        
+    Returns:
+        tuple: (duration in seconds, ffprobe format name), or (None, None)
+    """
+    ffprobe = find_executable('ffprobe')
+    if not ffprobe:
+        return None, None
     try:
-        # First try with pytube
-        from pytube import YouTube
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration,format_name", "-of", "json", url],
+            capture_output=True, text=True, timeout=60
+        )
+        media_format = json.loads(result.stdout or "{}").get("format", {})
+        return float(media_format["duration"]), media_format.get("format_name")
+    except (subprocess.SubprocessError, ValueError, KeyError) as e:
+        print(f"Could not probe {url}: {e}")
+        return None, None
+
+MP3_WORST_CASE_KBPS = 320  # Bitrate assumed for VBR ("--audio-quality 0") MP3 output
+
+def estimate_download_size(url, cookie_file=None, policy=None):
+    """
+    Estimate the disk space a download needs, without downloading it.
+    
+    Direct URLs are asked with a HEAD request. YouTube URLs are resolved with
+    ``yt-dlp -j`` using the same format selection as the download; while
+    converting, the source stream and the MP3 exist side by side, so both
+    are counted.
+    
+    Args:
+        url (str): The URL to probe
+        cookie_file (str, optional): Cookie file for yt-dlp
+        policy (FormatPolicy, optional): Bitrate/codec budget for YouTube downloads
         
-        yt = YouTube(url)
-        audio_stream = yt.streams.filter(only_audio=True).first()
+    Returns:
+        int: Expected bytes, or None if the size could not be determined
+    """
+    if not is_youtube_url(url):
+        try:
+            response = get_session().head(url, allow_redirects=True)
+            size = int(response.headers.get('content-length', 0)) if response.ok else 0
+        except (requests.RequestException, ValueError):
+            return None
+        return size or None
+    
+    yt_dlp = find_executable('yt-dlp')
+    if not yt_dlp:
+        return None
+    format_args = _format_args(policy)
+    cmd = [yt_dlp, "-j", "--no-playlist", "--no-warnings"] + format_args[:format_args.index("--audio-quality")]
+    if cookie_file:
+        cmd.extend(["--cookies", cookie_file])
+    try:
+        result = subprocess.run(cmd + [url], capture_output=True, text=True, timeout=120)
+        info = json.loads(result.stdout.splitlines()[0]) if result.returncode == 0 and result.stdout else {}
+    except (subprocess.SubprocessError, ValueError) as e:
+        print(f"Could not probe {url}: {e}")
+        return None
+    source = info.get('filesize') or info.get('filesize_approx')
+    duration = info.get('duration')
+    if not source and not duration:
+        return None
+    quality = format_args[format_args.index("--audio-quality") + 1]
+    mp3_kbps = MP3_WORST_CASE_KBPS if quality == "0" else int(quality.rstrip('K'))
+    if not source:
+        source = duration * (info.get('abr') or mp3_kbps) * 125
+    return int(source + (duration or 0) * mp3_kbps * 125)
+
+def _cut_with_ffmpeg(source, output_path, offset=0, duration=None):
+    """
+    Cut a section out of a media file or URL with ffmpeg.
+    
+    The stream is copied when the output format allows it and re-encoded otherwise.
+    
+    Returns:
+        bool: True if ffmpeg succeeded
+    """
+    ffmpeg = find_executable('ffmpeg')
+    cmd = [ffmpeg, "-y", "-v", "error", "-ss", f"{max(0, offset):.3f}"]
+    if duration is not None:
+        cmd.extend(["-t", f"{duration:.3f}"])
+    cmd.extend(["-i", source, "-vn"])
+    for codec_args in (["-c", "copy"], []):
+        result = subprocess.run(cmd + codec_args + [output_path], capture_output=True, text=True)
+        if result.returncode == 0:
+            return True
+    print(f"ffmpeg failed: {result.stderr.strip()}")
+    return False
+
+def download_audio_range(url, output_path=None, start=None, end=None):
+    """
+    Download only a time range of a direct audio file.
+    
+    Frame-based streams (MP3, ADTS AAC) are fetched with a ranged GET for the
+    bytes estimated to cover the section (from the file size and duration, plus
+    some padding) and then trimmed with ffmpeg. Other formats are cut by ffmpeg
+    straight from the URL, which seeks with range requests of its own. Without
+    ffmpeg/ffprobe or range support the whole file is downloaded.
+    
+    Args:
+        url (str): The URL of the audio file
+        output_path (str, optional): Path where the clip should be saved
+        start (float, optional): Start of the section in seconds
+        end (float, optional): End of the section in seconds
+    
+    Returns:
+        str: Path to the downloaded clip
+    """
+    try:
+        start = start or 0
+        if not output_path:
+            output_path = _output_name(url)
         
-        if not audio_stream:
-            raise Exception("No audio stream found")
+        if not find_executable('ffmpeg'):
+            print("ffmpeg is not installed; downloading the whole file instead of a section.")
+            return download_audio(url, output_path)
         
-        if output_path:
-            # If output_path is specified, use it directly
-            out_file = audio_stream.download(filename=output_path)
-        else:
-            # Otherwise, download to a temporary file
-            out_file = audio_stream.download()
+        session = get_session()
+        head = session.head(url, allow_redirects=True)
+        size = int(head.headers.get('content-length', 0)) if head.ok else 0
+        accepts_ranges = head.headers.get('accept-ranges', '').lower() == 'bytes'
+        duration, format_name = probe_media(url)
+        if duration and end is not None:
+            end = min(end, duration)
+        length = None if end is None else end - start
         
-        # If the file is not already an MP3, convert it
-        base, ext = os.path.splitext(out_file)
-        if ext.lower() != '.mp3':
-            mp3_file = base + '.mp3'
-            os.rename(out_file, mp3_file)
-            out_file = mp3_file
+        if size and duration and accepts_ranges and format_name in RANGE_SEEKABLE_FORMATS:
+            byte_rate = size / duration
+            first = int(max(0, start - RANGE_PADDING) * byte_rate)
+            last = size - 1 if end is None else min(size - 1, int((end + RANGE_PADDING) * byte_rate))
+            print(f"Downloading bytes {first}-{last} of {size} for section {start}s-{end if end is not None else duration}s")
+            
+            response = session.get(url, headers={'Range': f'bytes={first}-{last}'}, stream=True)
+            response.raise_for_status()
+            if response.status_code == 206:
+                part_path = output_path + '.part'
+                print(f"Saving to: {output_path}")
+                try:
+                    _save_response(response, part_path, last - first + 1)
+                    print()
+                    ok = _cut_with_ffmpeg(part_path, output_path, start - first / byte_rate, length)
+                finally:
+                    if os.path.exists(part_path):
+                        os.unlink(part_path)
+                if not ok:
+                    return None
+                print("Download complete!")
+                return output_path
+            response.close()
+            print("Server ignored the range request")
         
-        print(f"Download complete! Audio saved to: {out_file}")
-        return out_file
+        print(f"Cutting section with ffmpeg from: {url}")
+        if not _cut_with_ffmpeg(url, output_path, start, length):
+            return None
+        print("Download complete!")
+        return output_path
         
     except Exception as e:
-        print(f"Error with pytube: {e}")
-        print("Falling back to youtube-dl/yt-dlp...")
-        
-        # Try with youtube-dl/yt-dlp
-        result = download_with_youtube_dl(url, output_path)
-        
-        if result:
-            return result
-        
-        # If youtube-dl fails, try with embed URL approach
-        print("Trying embed URL approach...")
-        result = download_with_youtube_dl_embed(url, output_path)
-        
-        if result:
-            return result
+        _report_error(f"Error downloading audio section: {e}", _is_permanent_error(e))
+        return None
+
+def _output_name(url, response=None):
+    """
+    Work out a file name for a direct download.
+    
+    Args:
+        url (str): The download URL
+        response (requests.Response, optional): Response whose Content-Disposition may name the file
         
-        # If all else fails, try direct download
-        print("Trying direct download as a last resort...")
-        return try_direct_youtube_download(url, output_path)
+    Returns:
+        str: The file name
+    """
+    output_path = None
+    
+    # Try to get filename from Content-Disposition header
+    if response is not None and 'Content-Disposition' in response.headers:
+        filename_match = re.search(r'filename="(.+)"', response.headers['Content-Disposition'])
+        if filename_match:
+            output_path = os.path.basename(filename_match.group(1))
+    
+    # If still no output_path, extract filename from URL
+    if not output_path:
+        parsed_url = urlparse(url)
+        output_path = os.path.basename(parsed_url.path)
+    
+    # If path is still empty or doesn't have an extension, use a default name
+    if not output_path or '.' not in output_path:
+        output_path = "downloaded_audio.mp3"
+    return output_path
+
+def _partial_size(path):
+    return os.path.getsize(path) if path and os.path.isfile(path) else 0
+
+def _resumed(response, offset):
+    """Check that a response to ``Range: bytes=<offset>-`` continues at ``offset``."""
+    return response.status_code == 206 and \
+        response.headers.get('Content-Range', '').startswith(f"bytes {offset}-")
 
-def download_audio(url, output_path=None):
+def download_audio(url, output_path=None, cookie_file=None, start=None, end=None, policy=None, sink=None,
+                   mirrors=None, resume=False):
     """
     Download an audio file from a URL and save it locally.
     
@@ -647,84 +1698,389 @@ def download_audio(url, output_path=None):
         url (str): The URL of the audio file to download
         output_path (str, optional): Path where the file should be saved.
                                     If not provided, it will be extracted from the URL.
+        cookie_file (str, optional): Existing cookie file for YouTube downloads
+        start (float or str, optional): Only download from this offset (seconds or [hh:]mm:ss)
+        end (float or str, optional): Only download up to this offset (seconds or [hh:]mm:ss)
+        policy (FormatPolicy, optional): Bitrate/codec budget for YouTube downloads
+        sink (optional): Output sink from audio_downloader_storage. Direct
+                         downloads are streamed into it; files produced by
+                         yt-dlp or ffmpeg are handed to it when finished.
+        mirrors (list, optional): Other URLs serving the same direct file. All
+                                  of them are probed and the fastest is used,
+                                  switching mirrors mid-transfer if it degrades.
+        resume (bool): Continue a partial file left by an interrupted
+                       download with a ranged request. YouTube downloads
+                       skip pytube and let yt-dlp resume its .part file.
     
     Returns:
-        str: Path to the downloaded file
+        str: Path (or sink location) of the downloaded file
     """
+    try:
+        start = parse_timestamp(start)
+        end = parse_timestamp(end)
+    except ValueError as e:
+        _report_error(f"Invalid time range: {e}", permanent=True)
+        return None
+    if start is not None and end is not None and end <= start:
+        _report_error(f"Invalid time range: end ({end}s) must be after start ({start}s)", permanent=True)
+        return None
+    
     # Check if it's a YouTube URL
     if is_youtube_url(url):
-        return download_from_youtube(url, output_path)
+        result = download_from_youtube(url, output_path, cookie_file=cookie_file, start=start, end=end,
+                                       policy=policy, resume=resume)
+        return sink.put_file(result, output_path) if sink and result else result
+    
+    if start is not None or end is not None:
+        result = download_audio_range(url, output_path, start, end)
+        return sink.put_file(result, output_path) if sink and result else result
     
     try:
+        if mirrors:
+            from audio_downloader_mirrors import download_from_mirrors
+            return download_from_mirrors([url] + list(mirrors), output_path, sink=sink)
+        
         # Send a GET request to the URL
         print(f"Downloading from: {url}")
         
         # Use a session with a user agent to avoid some restrictions
-        session = requests.Session()
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15',
-        })
+        session = get_session()
         
-        response = session.get(url, stream=True)
-        
-        # Check if the request was successful
-        response.raise_for_status()
+        offset = _partial_size(output_path) if resume and sink is None else 0
+        response = session.get(url, stream=True, headers={'Range': f"bytes={offset}-"} if offset else None)
         
         # Determine the filename if output_path is not provided
         if not output_path:
-            # Try to get filename from Content-Disposition header
-            if 'Content-Disposition' in response.headers:
-                import re
-                filename_match = re.search(r'filename="(.+)"', response.headers['Content-Disposition'])
-                if filename_match:
-                    output_path = filename_match.group(1)
-            
-            # If still no output_path, extract filename from URL
-            if not output_path:
-                parsed_url = urlparse(url)
-                output_path = os.path.basename(parsed_url.path)
-            
-            # If path is still empty or doesn't have an extension, use a default name
-            if not output_path or '.' not in output_path:
-                output_path = "downloaded_audio.mp3"
+            output_path = _output_name(url, response)
+            offset = _partial_size(output_path) if resume and sink is None else 0
+            if offset:
+                response.close()
+                response = session.get(url, stream=True, headers={'Range': f"bytes={offset}-"})
+        
+        if offset and response.status_code == 416:
+            # The partial file already holds the whole body
+            print(f"\nAlready complete: {output_path}")
+            return output_path
+        
+        # Check if the request was successful
+        response.raise_for_status()
+        if offset and not _resumed(response, offset):
+            print("Server does not support resuming; downloading from the start.")
+            offset = 0
         
         # Save the file
         total_size = int(response.headers.get('content-length', 0))
-        downloaded = 0
-        chunk_size = 8192
-        
-        print(f"Saving to: {output_path}")
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    
-                    # Calculate and display progress
-                    if total_size > 0:
-                        percent = int(100 * downloaded / total_size)
-                        sys.stdout.write(f"\rDownloading: {percent}% [{downloaded} / {total_size} bytes]")
-                        sys.stdout.flush()
+        total_size = total_size + offset if total_size else 0
+        
+        if sink is not None:
+            # Stream straight into the sink without a local copy
+            writer = sink.open(output_path)
+            print(f"Streaming to: {sink.location(output_path)}")
+            try:
+                _copy_response(response, writer, total_size)
+            except BaseException:
+                writer.abort()
+                raise
+            output_path = writer.close()
+        else:
+            print(f"Saving to: {output_path}" + (f" (resuming at byte {offset})" if offset else ""))
+            _save_response(response, output_path, total_size, offset)
         
         print("\nDownload complete!")
         return output_path
         
     except Exception as e:
-        print(f"Error downloading audio: {e}")
+        _report_error(f"Error downloading audio: {e}", _is_permanent_error(e))
         return None
 
+SyncResult = namedtuple('SyncResult', ['url', 'status', 'path', 'error'])
+
+def load_json_state(path):
+    """
+    Load a JSON state file, such as the validators saved by a previous sync run.
+    
+    Args:
+        path (str): Path to the JSON state file
+        
+    Returns:
+        dict: The saved state, or an empty dict if the file does not exist
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_json_state(path, state):
+    """
+    Write a JSON state file atomically so an interrupted run cannot corrupt it.
+    
+    Each call writes its own temporary file, so concurrent writers never
+    interleave; the last replace wins.
+    """
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                     dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(temp_path, path)
+    except BaseException:
+        _remove_file(temp_path)
+        raise
+
+def sync_audio(url, output_path=None, state=None):
+    """
+    Download a direct audio URL only if it changed since the last sync.
+    
+    Sends If-None-Match/If-Modified-Since with the ETag and Last-Modified
+    recorded in ``state``; a 304 response skips the transfer. New content is
+    written to a temporary file and moved into place when complete.
+    
+    Args:
+        url (str): The URL of the audio file
+        output_path (str, optional): Where to save it; defaults to the path
+                                     recorded in state, then the URL's file name
+        state (dict, optional): Sync state from load_json_state, updated in place
+    
+    Returns:
+        SyncResult: status is 'changed', 'unchanged' or 'failed'
+    """
+    state = {} if state is None else state
+    entry = state.get(url, {})
+    output_path = output_path or entry.get('path')
+    try:
+        if is_youtube_url(url):
+            raise ValueError("YouTube URLs cannot be synced")
+        
+        # Only revalidate when we still have the file the validators describe
+        headers = {}
+        if output_path and os.path.exists(output_path):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        response = get_session().get(url, headers=headers, stream=True)
+        if response.status_code == 304:
+            response.close()
+            entry['checked'] = time.time()
+            print(f"Unchanged: {url}")
+            return SyncResult(url, 'unchanged', output_path, None)
+        response.raise_for_status()
+        
+        if not output_path:
+            output_path = _output_name(url, response)
+        part_path = output_path + '.part'
+        print(f"Changed: {url} -> {output_path}")
+        _save_response(response, part_path)
+        os.replace(part_path, output_path)
+        
+        state[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'path': output_path,
+            'size': os.path.getsize(output_path),
+            'checked': time.time(),
+        }
+        return SyncResult(url, 'changed', output_path, None)
+    
+    except Exception as e:
+        print(f"Error syncing {url}: {e}")
+        return SyncResult(url, 'failed', output_path, str(e))
+
+def sync_urls(urls, state_path, output_dir=None, workers=4):
+    """
+    Sync a list of direct audio URLs concurrently with conditional GETs.
+    
+    Args:
+        urls (iterable): URLs, or (url, output_path) tuples
+        state_path (str): JSON file holding the validators between runs
+        output_dir (str, optional): Directory for files without an explicit output path
+        workers (int): Number of concurrent requests
+    
+    Returns:
+        dict: Number of URLs that were 'changed', 'unchanged' or 'failed'
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    state = load_json_state(state_path)
+    taken = {entry.get('path'): url for url, entry in state.items()}
+    jobs = []
+    for item in dedupe_urls(urls):
+        url, output_path = (item, None) if isinstance(item, str) else item
+        if not output_path and url not in state:
+            output_path = _output_name(url)
+            if output_dir:
+                output_path = os.path.join(output_dir, output_path)
+            if taken.get(output_path, url) != url:
+                # Another URL already syncs to this name; keep them apart
+                base, ext = os.path.splitext(output_path)
+                digest = hashlib.sha1(canonicalize_url(url).key.encode('utf-8')).hexdigest()[:8]
+                output_path = f"{base}-{digest}{ext}"
+            taken[output_path] = url
+        jobs.append((url, output_path))
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    counts = {'changed': 0, 'unchanged': 0, 'failed': 0}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for result in executor.map(lambda job: sync_audio(job[0], job[1], state), jobs):
+                counts[result.status] += 1
+    finally:
+        save_json_state(state_path, state)
+    return counts
+
 def main():
     parser = argparse.ArgumentParser(description='Download audio from a URL.')
-    parser.add_argument('url', help='URL to download audio from')
+    parser.add_argument('url', nargs='?', help='URL to download audio from')
     parser.add_argument('-o', '--output', help='Output file path')
     parser.add_argument('--no-cookies', action='store_true', help='Do not use browser cookies')
+    parser.add_argument('--daemon', metavar='ADDRESS',
+                        help='Submit the job to a running daemon (e.g. http://127.0.0.1:8765 or unix:///path.sock)')
+    parser.add_argument('--priority', choices=('interactive', 'normal', 'bulk'),
+                        help='Priority class of daemon jobs (default: normal, or bulk with --batch)')
+    parser.add_argument('--start', type=parse_timestamp, metavar='TIME',
+                        help='Only download from this offset (seconds or [hh:]mm:ss)')
+    parser.add_argument('--end', type=parse_timestamp, metavar='TIME',
+                        help='Only download up to this offset (seconds or [hh:]mm:ss)')
+    parser.add_argument('--max-bitrate', type=int, metavar='KBPS',
+                        help='Highest YouTube source bitrate to fetch, in kbps')
+    parser.add_argument('--codec', metavar='LIST', help='Preferred source codecs, e.g. opus,aac')
+    parser.add_argument('--content', choices=sorted(CONTENT_PROFILES),
+                        help='Content profile: fetch the smallest stream good enough for speech or music')
+    parser.add_argument('--s3-bucket', metavar='BUCKET',
+                        help='Stream output into this S3-compatible bucket instead of local files (needs boto3)')
+    parser.add_argument('--s3-prefix', default='', metavar='PREFIX', help='Key prefix for --s3-bucket')
+    parser.add_argument('--s3-endpoint', metavar='URL',
+                        help='Endpoint of an S3-compatible service (MinIO, moto, ...)')
+    parser.add_argument('--mirror', action='append', metavar='URL',
+                        help='Another URL serving the same file; the fastest mirror is used (repeatable)')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='Download every URL in FILE (one per line, optionally followed by an output path)')
+    parser.add_argument('--queue', metavar='DB',
+                        help='Job queue database for batch runs; rerunning resumes unfinished jobs '
+                             '(default: FILE.queue.db)')
+    parser.add_argument('--sync', metavar='FILE',
+                        help='Sync every direct URL in FILE, transferring only files that changed since the last run')
+    parser.add_argument('--sync-state', metavar='PATH',
+                        help='ETag/Last-Modified state for --sync (default: FILE.sync.json)')
+    parser.add_argument('--output-dir', metavar='DIR', help='Directory for files saved by --sync')
+    parser.add_argument('--workers', type=int, default=2, help='Concurrent downloads for batch and sync runs')
+    parser.add_argument('--retry-failed', action='store_true', help='Re-queue failed jobs before a batch run')
+    parser.add_argument('--order', default='fifo', choices=('fifo', 'shortest', 'largest', 'fair'),
+                        help='Order of batch jobs by expected size (default: fifo, the file order)')
+    parser.add_argument('--profile', nargs='?', const='profiles', metavar='DIR',
+                        help='Profile CPU and memory use of each job and write reports to DIR (default: profiles)')
+    parser.add_argument('--plan', action='store_true',
+                        help='Probe expected sizes before a batch run and only start jobs that fit on disk '
+                             '(implied by --order other than fifo)')
     
     args = parser.parse_args()
     
-    if is_youtube_url(args.url):
-        download_from_youtube(args.url, args.output)
+    if not args.url and not args.batch and not args.queue and not args.sync:
+        parser.error('a URL, --batch, --queue or --sync is required')
+    if args.start is not None and args.end is not None and args.end <= args.start:
+        parser.error(f'--end ({args.end:g}s) must be after --start ({args.start:g}s)')
+    try:
+        policy = make_format_policy(args.max_bitrate, args.codec, args.content)
+    except ValueError as e:
+        parser.error(str(e))
+    sink = None
+    if args.s3_bucket:
+        from audio_downloader_storage import make_sink
+        try:
+            sink = make_sink(args.s3_bucket, args.s3_prefix, args.s3_endpoint)
+        except RuntimeError as e:
+            parser.error(str(e))
+    
+    if args.sync:
+        from audio_downloader_queue import read_batch_file
+        counts = sync_urls(read_batch_file(args.sync), args.sync_state or args.sync + '.sync.json',
+                           output_dir=args.output_dir, workers=args.workers)
+        print("Sync finished: " + ", ".join(f"{n} {status}" for status, n in counts.items()))
+        if counts['failed']:
+            sys.exit(1)
+    elif args.daemon and args.batch:
+        from audio_downloader_daemon import DaemonClient, DaemonError
+        from audio_downloader_queue import read_batch_file
+        client = DaemonClient(args.daemon)
+        try:
+            for url, output_path in dedupe_urls(read_batch_file(args.batch)):
+                job = client.submit(url, os.path.abspath(output_path) if output_path else None,
+                                    policy=policy, profile=bool(args.profile), priority=args.priority or 'bulk')
+                print(f"Submitted job {job['id']}: {url}")
+        except DaemonError as e:
+            print(f"Daemon error: {e}")
+            sys.exit(1)
+    elif args.batch or args.queue:
+        from audio_downloader_queue import JobQueue, DiskSpace, run_queue, read_batch_file, output_filesystem
+        queue = JobQueue(args.queue or args.batch + '.queue.db', order=args.order)
+        if args.batch:
+            items = read_batch_file(args.batch)
+            unique = dedupe_urls(items)
+            if len(unique) < len(items):
+                print(f"Skipped {len(items) - len(unique)} duplicate URLs")
+            added = queue.add(unique)
+            print(f"Queued {added} new jobs from {args.batch}")
+        if args.retry_failed:
+            print(f"Re-queued {queue.retry_failed()} failed jobs")
+        cookie_file = None if args.no_cookies else get_browser_cookies()
+        disk = None
+        if args.plan or args.order != 'fifo':
+            print("Estimating download sizes...")
+            planned = queue.plan(lambda url: estimate_download_size(url, cookie_file, policy),
+                                 workers=max(4, 2 * args.workers))
+            print(f"Planned {planned} jobs")
+            if sink is None:
+                # Sinks store the output elsewhere, so local space is not the limit
+                disk = DiskSpace(output_filesystem(queue))
+        try:
+            counts = run_queue(queue, args.workers, cookie_file=cookie_file, policy=policy, sink=sink, disk=disk,
+                               profile_dir=args.profile)
+        finally:
+            if cookie_file and os.path.exists(cookie_file):
+                os.unlink(cookie_file)
+        print("Batch finished: " + ", ".join(f"{n} {state}" for state, n in counts.items()))
+        if counts['failed']:
+            sys.exit(1)
+    elif args.daemon:
+        from audio_downloader_daemon import DaemonClient, DaemonError
+        client = DaemonClient(args.daemon)
+        job = None
+        try:
+            job = client.submit(args.url, os.path.abspath(args.output) if args.output else None,
+                                start=args.start, end=args.end, policy=policy, profile=bool(args.profile),
+                                priority=args.priority or 'normal')
+            print(f"Submitted job {job['id']} to {args.daemon}")
+            job = client.wait(job['id'])
+        except DaemonError as e:
+            print(f"Daemon error: {e}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            if job:
+                client.cancel(job['id'])
+                print(f"\nCancelled job {job['id']}")
+            sys.exit(1)
+        if job['state'] != 'done':
+            print(f"Job {job['state']}: {job['error']}")
+            sys.exit(1)
+        print(f"Download complete! Audio saved to: {job['result']}")
+        if job.get('profile'):
+            print(f"Profile report (on the daemon host): {job['profile']}")
     else:
-        download_audio(args.url, args.output)
+        profiler = nullcontext()
+        if args.profile:
+            from audio_downloader_profiling import profile_job
+            profiler = profile_job(args.output or args.url, args.profile)
+        with profiler:
+            if is_youtube_url(args.url) and not sink and not args.mirror:
+                download_from_youtube(args.url, args.output, start=args.start, end=args.end, policy=policy)
+            else:
+                result = download_audio(args.url, args.output, start=args.start, end=args.end, policy=policy,
+                                        sink=sink, mirrors=args.mirror)
+                if result and sink:
+                    sink.flush()
+                    print(f"Stored: {result}")
 
 if __name__ == "__main__":
     main()
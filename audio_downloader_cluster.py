@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Multi-node sharded execution with a lease-based coordinator.
+
+A coordinator process holds the job list in a JobQueue database and serves it
+over the daemon's JSON HTTP transport. Workers on any number of hosts claim
+batches of jobs under time-limited leases, run them through the regular
+download functions, renew their leases with heartbeats and report results.
+Leases that expire (worker crashed or lost its network) are reassigned on the
+next claim.
+
+    python audio_downloader_cluster.py coordinator --listen http://10.0.0.5:8770 --batch urls.txt
+    python audio_downloader_cluster.py worker --coordinator http://10.0.0.5:8770 --workers 4
+
+Requests carry the API token that the daemon module uses: the coordinator
+prints where it is stored, and remote workers get it with --token or
+$AUDIO_DOWNLOADER_TOKEN.
+
+API:
+    POST /jobs       add {"urls": [url or [url, output], ...]}
+    POST /claim      {"worker": ..., "limit": n} -> {"jobs": [...], "lease": seconds}
+    POST /heartbeat  {"worker": ..., "jobs": [ids]} -> {"renewed": n}
+    POST /complete   {"worker": ..., "job": id, "result": path}
+    POST /fail       {"worker": ..., "job": id, "error": message, "permanent": bool}
+    GET  /stats      job counts by state
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import audio_downloader
+from audio_downloader_queue import JobQueue, DEFAULT_LEASE, ORDER_CHOICES, read_batch_file, run_job
+from audio_downloader_daemon import DaemonClient, DaemonError, TOKEN_ENV, TOKEN_PATH, check_address, make_server
+
+DEFAULT_COORDINATOR = "http://127.0.0.1:8770"
+
+class Coordinator:
+    """Serves a JobQueue to remote workers."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def handle(self, method, parts, body):
+        """
+        Dispatch one API request.
+
+        Returns:
+            tuple: (HTTP status, JSON-serializable payload)
+        """
+        queue = self.queue
+        if method == "GET" and parts == ["stats"]:
+            return 200, {"counts": queue.counts()}
+        if method != "POST" or len(parts) != 1:
+            return 404, {"error": f"Unknown endpoint: {method} /{'/'.join(parts)}"}
+
+        endpoint = parts[0]
+        if endpoint == "jobs":
+            urls = [url if isinstance(url, str) else tuple(url) for url in body.get("urls", [])]
+            return 200, {"added": queue.add(audio_downloader.dedupe_urls(urls))}
+
+        worker = body.get("worker")
+        if not worker:
+            return 400, {"error": "Missing 'worker'"}
+        if endpoint == "claim":
+            jobs = queue.claim(worker, limit=max(1, int(body.get("limit", 1))))
+            return 200, {
+                "jobs": [{"id": job["id"], "url": job["url"], "output": job["output"],
+                          "attempts": job["attempts"]} for job in jobs],
+                "lease": queue.lease_seconds,
+            }
+        if endpoint == "heartbeat":
+            return 200, {"renewed": queue.heartbeat(body.get("jobs", []), worker)}
+        if endpoint == "complete":
+            return 200, {"ok": queue.complete(body["job"], worker, body.get("result"))}
+        if endpoint == "fail":
+            return 200, {"ok": queue.fail(body["job"], worker, body.get("error") or "Download failed",
+                                          bool(body.get("permanent")))}
+        return 404, {"error": f"Unknown endpoint: {method} /{endpoint}"}
+
+class CoordinatorClient(DaemonClient):
+    """Client for the coordinator API."""
+
+    def __init__(self, address=DEFAULT_COORDINATOR, worker=None, timeout=30, token=None):
+        super().__init__(address, timeout, token)
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+
+    def add(self, urls):
+        return self.request("POST", "/jobs", {"urls": list(urls)})["added"]
+
+    def claim(self, limit=1):
+        return self.request("POST", "/claim", {"worker": self.worker, "limit": limit})
+
+    def heartbeat(self, job_ids):
+        return self.request("POST", "/heartbeat", {"worker": self.worker, "jobs": list(job_ids)})["renewed"]
+
+    def complete(self, job_id, result=None):
+        return self.request("POST", "/complete", {"worker": self.worker, "job": job_id, "result": result})["ok"]
+
+    def fail(self, job_id, error, permanent=False):
+        return self.request("POST", "/fail", {"worker": self.worker, "job": job_id, "error": error,
+                                              "permanent": permanent})["ok"]
+
+    def stats(self):
+        return self.request("GET", "/stats")["counts"]
+
+def run_worker(address=DEFAULT_COORDINATOR, workers=2, batch_size=None, poll_interval=5,
+               cookie_file=None, policy=None, sink=None, token=None):
+    """
+    Claim and run jobs from a coordinator until its queue is drained.
+
+    Args:
+        address (str): Coordinator address
+        workers (int): Number of concurrent downloads on this host
+        batch_size (int, optional): Most jobs claimed per request, defaults to ``workers``
+        poll_interval (float): Seconds to wait while other workers still hold jobs
+        cookie_file (str, optional): Browser cookie file for YouTube downloads
+        policy (FormatPolicy, optional): Bitrate/codec budget for YouTube downloads
+        sink (optional): Output sink from audio_downloader_storage
+        token (str, optional): Coordinator API token, defaults to load_token()
+
+    Returns:
+        dict: Number of jobs this worker completed and attempts that failed
+    """
+    client = CoordinatorClient(address, token=token)
+    batch_size = batch_size or workers
+    held = set()  # Claimed job IDs whose leases we keep alive
+    held_lock = threading.Lock()
+    stopped = threading.Event()
+    totals = {"done": 0, "failed": 0}
+    # A download slot frees up as soon as its download ends; the upload then
+    # runs alongside the next download, at most one per slot
+    uploads = threading.BoundedSemaphore(workers)
+
+    def heartbeat(interval):
+        while not stopped.wait(interval):
+            with held_lock:
+                job_ids = list(held)
+            if not job_ids:
+                continue
+            try:
+                renewed = client.heartbeat(job_ids)
+                if renewed < len(job_ids):
+                    print(f"Lost {len(job_ids) - renewed} leases to other workers")
+            except DaemonError as e:
+                print(f"Heartbeat failed: {e}")
+
+    def report(job, result, error, permanent):
+        # Called once the job's output is stored; its lease is renewed until then
+        with held_lock:
+            totals["done" if error is None else "failed"] += 1
+        try:
+            if error:
+                print(f"[job {job['id']}] failed: {error}")
+                reported = client.fail(job["id"], error, permanent)
+            else:
+                reported = client.complete(job["id"], result)
+            if not reported:
+                print(f"[job {job['id']}] lease was lost; result not recorded")
+        except DaemonError as e:
+            print(f"[job {job['id']}] could not report result: {e}")
+        finally:
+            with held_lock:
+                held.discard(job["id"])
+            uploads.release()
+
+    def execute(job):
+        uploads.acquire()
+        print(f"[job {job['id']}] attempt {job['attempts']} on {client.worker}: {job['url']}")
+        run_job(job, cookie_file, policy, sink, on_stored=lambda *outcome: report(job, *outcome))
+
+    heartbeat_thread = None
+    running = set()  # Futures of jobs in progress on this host
+    print(f"Worker {client.worker} connected to {address}")
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                # Claim only as many jobs as there are free slots, so a long
+                # download never holds back the other slots
+                claimed = client.claim(min(batch_size, workers - len(running)))
+                jobs = claimed["jobs"]
+                if heartbeat_thread is None:
+                    heartbeat_thread = threading.Thread(
+                        target=heartbeat, args=(max(1, claimed["lease"] / 3),), daemon=True
+                    )
+                    heartbeat_thread.start()
+                with held_lock:
+                    held.update(job["id"] for job in jobs)
+                running.update(executor.submit(execute, job) for job in jobs)
+                if not running:
+                    counts = client.stats()
+                    if not counts["queued"] and not counts["running"]:
+                        break
+                    # Other workers still hold leases that may expire and come back
+                    time.sleep(poll_interval)
+                    continue
+                # Wait for a free slot; with slots already free, poll for new jobs
+                done, running = wait(running, timeout=None if len(running) == workers else poll_interval,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+    finally:
+        stopped.set()
+    return totals
+
+def serve_coordinator(address, queue, spawn_workers=0, token=None):
+    """
+    Run a coordinator until interrupted, optionally with local worker processes.
+
+    Args:
+        address (str): Address to listen on
+        queue (JobQueue): The job list
+        spawn_workers (int): Number of local worker processes to start
+        token (str, optional): API token workers must send (see server_token)
+    """
+    server = make_server(address, Coordinator(queue), token=token)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"Coordinator listening on {address}: {queue.counts()}")
+    if server.token and not token and not os.environ.get(TOKEN_ENV):
+        print(f"API token for workers: {TOKEN_PATH}")
+
+    env = dict(os.environ, **({TOKEN_ENV: server.token} if server.token else {}))
+    processes = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker", "--coordinator", address], env=env)
+        for _ in range(spawn_workers)
+    ]
+    try:
+        if processes:
+            for process in processes:
+                process.wait()
+            print(f"Local workers finished: {queue.counts()}")
+        else:
+            thread.join()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+        for process in processes:
+            process.terminate()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Distribute downloads across several hosts.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = commands.add_parser('coordinator', help='Hold the job list and hand out leases')
+    coordinator.add_argument('--listen', default=DEFAULT_COORDINATOR,
+                             help=f'Address to listen on (default: {DEFAULT_COORDINATOR}); '
+                                  'use a private network address so other hosts can connect')
+    coordinator.add_argument('--queue', default='cluster.queue.db', help='Job queue database')
+    coordinator.add_argument('--batch', metavar='FILE', help='Add the URLs in FILE to the queue')
+    coordinator.add_argument('--lease', type=float, default=DEFAULT_LEASE, help='Lease length in seconds')
+    coordinator.add_argument('--retry-failed', action='store_true', help='Re-queue failed jobs')
+    coordinator.add_argument('--order', default='fifo', choices=ORDER_CHOICES,
+                             help='Hand out jobs by expected size; probes sizes first unless fifo')
+    coordinator.add_argument('--spawn-workers', type=int, default=0, metavar='N',
+                             help='Start N local worker processes and exit when they finish')
+
+    worker = commands.add_parser('worker', help='Claim and run jobs from a coordinator')
+    worker.add_argument('--coordinator', default=DEFAULT_COORDINATOR, help='Coordinator address')
+    worker.add_argument('--workers', type=int, default=2, help='Concurrent downloads on this host')
+    worker.add_argument('--batch-size', type=int, help='Jobs claimed per request (default: --workers)')
+    worker.add_argument('--no-cookies', action='store_true', help='Do not use browser cookies')
+    worker.add_argument('--s3-bucket', metavar='BUCKET', help='Store output in this S3-compatible bucket')
+    worker.add_argument('--s3-prefix', default='', metavar='PREFIX', help='Key prefix for --s3-bucket')
+    worker.add_argument('--s3-endpoint', metavar='URL', help='Endpoint of an S3-compatible service')
+
+    stats = commands.add_parser('stats', help='Show job counts')
+    stats.add_argument('--coordinator', default=DEFAULT_COORDINATOR, help='Coordinator address')
+
+    for command in (coordinator, worker, stats):
+        command.add_argument('--token', help=f'API token (default: ${TOKEN_ENV} or {TOKEN_PATH})')
+
+    args = parser.parse_args()
+
+    if args.command == 'coordinator':
+        try:
+            check_address(args.listen)
+        except ValueError as e:
+            parser.error(str(e))
+        queue = JobQueue(args.queue, lease_seconds=args.lease, order=args.order)
+        if args.batch:
+            print(f"Queued {queue.add(audio_downloader.dedupe_urls(read_batch_file(args.batch)))} new jobs")
+        if args.retry_failed:
+            print(f"Re-queued {queue.retry_failed()} failed jobs")
+        if args.order != 'fifo':
+            print(f"Estimated the size of {queue.plan(audio_downloader.estimate_download_size)} jobs")
+        serve_coordinator(args.listen, queue, args.spawn_workers, token=args.token)
+    elif args.command == 'worker':
+        sink = None
+        if args.s3_bucket:
+            from audio_downloader_storage import make_sink
+            try:
+                sink = make_sink(args.s3_bucket, args.s3_prefix, args.s3_endpoint)
+            except RuntimeError as e:
+                parser.error(str(e))
+        cookie_file = None if args.no_cookies else audio_downloader.get_browser_cookies()
+        try:
+            totals = run_worker(args.coordinator, args.workers, args.batch_size, cookie_file=cookie_file,
+                                sink=sink, token=args.token)
+        except DaemonError as e:
+            print(f"Coordinator error: {e}")
+            sys.exit(1)
+        finally:
+            if cookie_file and os.path.exists(cookie_file):
+                os.unlink(cookie_file)
+        print(f"Worker finished: {totals['done']} done, {totals['failed']} failed attempts")
+    else:
+        print(CoordinatorClient(args.coordinator, token=args.token).stats())
+
+if __name__ == "__main__":
+    main()
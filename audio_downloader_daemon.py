@@ -0,0 +1,856 @@
+#!/usr/bin/env python3
+"""
+Long-running download daemon with a local JSON job API.
+
+Keeps one warm process (HTTP sessions, browser cookies, resolved tool paths)
+and runs submitted jobs through a shared scheduler. The CLI and GUI can act as
+thin clients through DaemonClient.
+
+API (JSON over HTTP, on a TCP port or a Unix socket). Requests that change
+state must be sent as ``Content-Type: application/json``, requests from a
+foreign Origin or Host are refused, and TCP listeners require the token from
+TOKEN_PATH (or $AUDIO_DOWNLOADER_TOKEN) as ``Authorization: Bearer <token>``,
+so web pages cannot submit jobs to a daemon on localhost:
+    POST   /jobs               submit {"url": ..., "output": ..., "start": ..., "end": ...,
+                               "format": {"max_bitrate": ..., "codecs": [...], "profile": ...},
+                               "profile": true,  (profile CPU and memory use of this job)
+                               "priority": "interactive" | "normal" | "bulk"}
+    GET    /jobs               list jobs; finished ones are kept for JOB_RETENTION
+                               seconds, at most MAX_FINISHED_JOBS of them
+    GET    /jobs/<id>          job status including the log tail
+    POST   /jobs/<id>/cancel   cancel a queued or running job
+    DELETE /jobs/<id>          same as cancel
+    GET    /stats              queue wait time and job counts per priority class
+
+Jobs are scheduled by priority class with weighted fair queuing, so bulk jobs
+still make progress under a steady stream of interactive ones. When every
+worker is busy, an interactive or normal job pauses a running bulk job, which
+is queued again and later resumes from where it stopped (with a ranged request
+for direct downloads, or yt-dlp's .part file).
+"""
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import socket
+import secrets
+import ipaddress
+import argparse
+import threading
+import socketserver
+import http.client
+from collections import deque
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import audio_downloader
+
+DEFAULT_ADDRESS = "http://127.0.0.1:8765"
+TOKEN_ENV = "AUDIO_DOWNLOADER_TOKEN"
+TOKEN_PATH = os.path.join(os.path.expanduser("~"), ".audio_downloader", "daemon.token")
+LOG_LINES = 200  # Log lines kept per job
+JOB_RETENTION = 3600  # Seconds finished jobs stay queryable
+MAX_FINISHED_JOBS = 1000  # Finished jobs kept at most, oldest dropped first
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+PRIORITY_CLASSES = ("interactive", "normal", "bulk")  # Highest first
+DEFAULT_PRIORITY = "normal"
+# Share of worker slots each class gets while all of them have jobs waiting
+CLASS_WEIGHTS = {"interactive": 8, "normal": 3, "bulk": 1}
+PREEMPTIBLE = ("bulk",)  # Classes whose running jobs may be paused for higher ones
+
+class DaemonError(Exception):
+    """Raised by DaemonClient when the daemon rejects a request or is unreachable."""
+
+class Job:
+    """A single download job tracked by the scheduler."""
+
+    def __init__(self, url, output_path=None, start=None, end=None, policy=None, profile=False,
+                 priority=DEFAULT_PRIORITY):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.output_path = output_path
+        self.start = start
+        self.end = end
+        self.policy = policy
+        self.profile = profile
+        self.profile_report = None
+        self.priority = priority
+        self.key = None
+        self.state = "queued"
+        self.created = time.time()
+        self.queued_at = self.created
+        self.queue_wait = 0.0  # Seconds spent queued, including time paused
+        self.preemptions = 0
+        self.preempting = None  # Job this one is being paused for, until it stops
+        self.resume = False
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.log = deque(maxlen=LOG_LINES)
+        self.log_count = 0
+        self.progress = None
+        self.cancel_event = threading.Event()
+
+    def add_log(self, line):
+        self.log.append(line)
+        self.log_count += 1
+
+    def to_dict(self, include_log=False):
+        data = {
+            "id": self.id,
+            "url": self.url,
+            "output": self.output_path,
+            "start": self.start,
+            "end": self.end,
+            "format": self.policy._asdict() if self.policy else None,
+            "priority": self.priority,
+            "state": self.state,
+            "created": self.created,
+            "queue_wait": self.queue_wait,
+            "preemptions": self.preemptions,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "error": self.error,
+            "progress": self.progress,
+            "profile": self.profile_report,
+            "log_count": self.log_count,
+        }
+        if include_log:
+            data["log"] = list(self.log)
+        return data
+
+class LogRouter:
+    """
+    sys.stdout replacement that sends output from job threads to the job's log.
+
+    The download functions report progress with print(), so routing by thread
+    keeps concurrent jobs' output apart without touching every call site.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def attach(self, job):
+        self._local.job = job
+        self._local.partial = ""
+
+    def detach(self):
+        self._local.job = None
+
+    def write(self, text):
+        job = getattr(self._local, "job", None)
+        if job is None:
+            return self.stream.write(text)
+        # Carriage returns mark in-place progress updates, which replace the
+        # job's progress line instead of growing its log
+        pieces = re.split(r"([\r\n])", self._local.partial + text)
+        self._local.partial = pieces.pop()
+        for line, end in zip(pieces[::2], pieces[1::2]):
+            if not line.strip():
+                continue
+            if end == "\r":
+                job.progress = line.strip()
+            else:
+                job.add_log(line.rstrip())
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class ClassStats:
+    """Queue wait statistics of one priority class."""
+
+    def __init__(self):
+        self.started = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.preempted = 0
+
+    def record_wait(self, wait):
+        self.started += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+class JobScheduler:
+    """
+    Runs jobs on a fixed pool of worker threads, by priority class.
+
+    Each class has its own FIFO queue. Workers pick the class with the lowest
+    virtual pass (stride scheduling): every start advances the class's pass
+    by 1/weight, so with all classes backlogged they get worker slots in the
+    ratio of CLASS_WEIGHTS, and no class starves. A class that was idle
+    rejoins at the current virtual time instead of catching up on the slots
+    it did not use.
+
+    A job that outranks a running PREEMPTIBLE job and finds no idle worker
+    pauses that job through its cancel event. The freed worker goes straight
+    to the job that asked for it, and the paused job goes back to the front of
+    its class with ``resume`` set.
+    """
+
+    def __init__(self, runner, workers=2, retention=JOB_RETENTION, max_finished=MAX_FINISHED_JOBS):
+        self.runner = runner
+        self.workers = workers
+        self.retention = retention
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._active = {}  # canonical URL key -> queued or running job
+        self._pending = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._pass = dict.fromkeys(PRIORITY_CLASSES, 0.0)
+        self._vtime = 0.0  # Pass of the class that was scheduled last
+        self._running = []
+        self._handoffs = deque()  # Jobs owed the slot of a job paused for them
+        self._stats = {priority: ClassStats() for priority in PRIORITY_CLASSES}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            for job in self.jobs.values():
+                job.cancel_event.set()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def submit(self, job):
+        """
+        Queue a job, unless the same content is already queued or running.
+
+        Returns:
+            Job: The submitted job, or the existing job for the same URL
+        """
+        if job.priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority {job.priority!r}, expected one of {', '.join(PRIORITY_CLASSES)}")
+        key = (audio_downloader.canonicalize_url(job.url).key, job.output_path, job.start, job.end, job.policy)
+        with self._cond:
+            existing = self._active.get(key)
+            if existing is not None:
+                return existing
+            job.key = key
+            self._active[key] = job
+            self._evict()
+            self.jobs[job.id] = job
+            self._enqueue(job)
+            self._preempt_for(job)
+            self._cond.notify()
+        return job
+
+    def _enqueue(self, job, front=False):
+        queue = self._pending[job.priority]
+        if not queue:
+            # Idle classes do not bank the slots they did not use
+            self._pass[job.priority] = max(self._pass[job.priority], self._vtime)
+        if front:
+            queue.appendleft(job)
+        else:
+            queue.append(job)
+        job.queued_at = time.time()
+
+    def _preempt_for(self, job):
+        """Pause one running lower-priority job if ``job`` would otherwise wait."""
+        rank = PRIORITY_CLASSES.index(job.priority)
+        outranking = sum(len(self._pending[priority]) for priority in PRIORITY_CLASSES[:rank + 1])
+        pausing = sum(1 for running in self._running if running.preempting)
+        idle = self.workers - len(self._running)
+        if outranking <= idle + pausing:
+            return
+        victims = [running for running in self._running
+                   if running.priority in PREEMPTIBLE and not running.preempting
+                   and PRIORITY_CLASSES.index(running.priority) > rank]
+        if victims:
+            # The most recently started job has the least progress to set aside
+            victim = max(victims, key=lambda running: running.started)
+            victim.preempting = job
+            victim.cancel_event.set()
+
+    def _evict(self):
+        """Forget finished jobs past the retention period or the count limit. Holds ``_cond``."""
+        finished = sorted((job for job in self.jobs.values() if job.state in FINISHED_STATES and job.finished is not None),
+                          key=lambda job: job.finished)
+        cutoff = time.time() - self.retention
+        excess = len(finished) - self.max_finished
+        for i, job in enumerate(finished):
+            if i < excess or job.finished < cutoff:
+                del self.jobs[job.id]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        with self._cond:
+            self._evict()
+            return sorted(self.jobs.values(), key=lambda job: job.created)
+
+    def stats(self):
+        """
+        Per-class queue wait and job counts.
+
+        Returns:
+            dict: Priority class -> statistics; wait times are in seconds
+        """
+        now = time.time()
+        with self._cond:
+            result = {}
+            for priority in PRIORITY_CLASSES:
+                stats = self._stats[priority]
+                queue = self._pending[priority]
+                result[priority] = {
+                    "weight": CLASS_WEIGHTS[priority],
+                    "queued": len(queue),
+                    "running": sum(1 for job in self._running if job.priority == priority),
+                    "started": stats.started,
+                    "preempted": stats.preempted,
+                    "wait_avg": stats.wait_total / stats.started if stats.started else 0.0,
+                    "wait_max": stats.wait_max,
+                    "oldest_queued": max((now - job.queued_at for job in queue), default=0.0),
+                }
+            return result
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Queued and paused jobs are dropped immediately; running
+        jobs stop at their next cancellation check.
+
+        Returns:
+            Job: The job, or None if it does not exist
+        """
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state in ("queued", "paused"):
+                self._pending[job.priority].remove(job)
+                self._active.pop(job.key, None)
+                job.state = "cancelled"
+                job.finished = time.time()
+            job.preempting = None
+            job.cancel_event.set()
+            return job
+
+    def _next_job(self):
+        with self._cond:
+            while not any(self._pending.values()) and not self._stopping:
+                self._cond.wait()
+            if self._stopping:
+                return None
+            job = None
+            while self._handoffs and job is None:
+                owed = self._handoffs.popleft()
+                if owed.state == "queued":
+                    job = owed
+            if job is not None:
+                priority = job.priority
+                self._pending[priority].remove(job)
+            else:
+                priority = min((priority for priority in PRIORITY_CLASSES if self._pending[priority]),
+                               key=lambda priority: self._pass[priority])
+                job = self._pending[priority].popleft()
+            self._vtime = self._pass[priority]
+            self._pass[priority] += 1 / CLASS_WEIGHTS[priority]
+            job.state = "running"
+            job.started = time.time()
+            wait = job.started - job.queued_at
+            job.queue_wait += wait
+            self._stats[priority].record_wait(wait)
+            self._running.append(job)
+            return job
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job):
+        audio_downloader.clear_last_error()
+        try:
+            result = self.runner(job)
+        except audio_downloader.DownloadCancelled:
+            with self._cond:
+                self._running.remove(job)
+                if job.preempting and not self._stopping:
+                    self._pause(job)
+                    return
+            job.state = "cancelled"
+        except (Exception, SystemExit) as e:
+            # The downloaders call sys.exit() when no tool is installed
+            job.state = "failed"
+            job.error = str(e) or e.__class__.__name__
+        else:
+            if result:
+                job.state = "done"
+                job.result = result
+            else:
+                job.state = "failed"
+                job.error = audio_downloader.last_error() or (job.log[-1] if job.log else "Download failed")
+        job.finished = time.time()
+        with self._cond:
+            if job in self._running:
+                self._running.remove(job)
+            self._active.pop(job.key, None)
+
+    def _pause(self, job):
+        """Put a preempted job back at the front of its class. Holds ``_cond``."""
+        self._handoffs.append(job.preempting)
+        job.preempting = None
+        job.preemptions += 1
+        job.resume = True
+        job.state = "paused"
+        job.progress = None
+        job.add_log(f"Paused for a higher-priority job (pause {job.preemptions})")
+        job.cancel_event.clear()
+        self._stats[job.priority].preempted += 1
+        self._enqueue(job, front=True)
+        self._cond.notify()
+
+class DownloadDaemon:
+    """Warm download state shared by every job the daemon runs."""
+
+    def __init__(self, workers=2, use_cookies=True, profile_dir=None, profile_all=False, output_dir=None):
+        self.output_dir = os.path.realpath(output_dir or os.getcwd())
+        self.downloader = audio_downloader.Downloader(
+            pool_size=max(workers, audio_downloader.DEFAULT_POOL_SIZE), use_cookies=use_cookies
+        )
+        self.scheduler = JobScheduler(self.run_job, workers)
+        self.log_router = None
+        self.profile_dir = profile_dir or "profiles"
+        self.profile_all = profile_all
+
+    def start(self):
+        if not isinstance(sys.stdout, LogRouter):
+            sys.stdout = LogRouter(sys.stdout)
+        self.log_router = sys.stdout
+        self.scheduler.start()
+
+    def close(self):
+        self.scheduler.stop()
+        self.downloader.close()
+
+    def run_job(self, job):
+        profiler = nullcontext()
+        if job.profile or self.profile_all:
+            from audio_downloader_profiling import profile_job
+            profiler = profile_job(f"job-{job.id}", self.profile_dir)
+        profile = None
+        try:
+            # The profiler's summary goes to the daemon's output, not the job log
+            with profiler as profile:
+                if job.output_path:
+                    os.makedirs(os.path.dirname(job.output_path), exist_ok=True)
+                audio_downloader.set_cancel_event(job.cancel_event)
+                self.log_router.attach(job)
+                try:
+                    return self.downloader.download_audio(
+                        job.url, job.output_path, start=job.start, end=job.end, policy=job.policy,
+                        resume=job.resume
+                    )
+                finally:
+                    self.log_router.detach()
+                    audio_downloader.set_cancel_event(None)
+        finally:
+            if profile is not None:
+                job.profile_report = os.path.abspath(profile.report_path)
+
+    def resolve_output(self, output):
+        """
+        Resolve a job's output path inside the output directory.
+
+        Raises:
+            ValueError: If the path points outside the output directory
+
+        Returns:
+            str: Absolute path, or None to name the file after its source
+        """
+        if not output:
+            return None
+        path = os.path.realpath(os.path.join(self.output_dir, output))
+        if os.path.commonpath([path, self.output_dir]) != self.output_dir:
+            raise ValueError(f"Output path must be inside {self.output_dir}: {output}")
+        return path
+
+    def handle(self, method, parts, body):
+        """
+        Dispatch one API request.
+
+        Returns:
+            tuple: (HTTP status, JSON-serializable payload)
+        """
+        scheduler = self.scheduler
+        if parts == ["jobs"]:
+            if method == "GET":
+                return 200, {"jobs": [job.to_dict() for job in scheduler.list()]}
+            if method == "POST":
+                priority = body.get("priority") or DEFAULT_PRIORITY
+                if priority not in PRIORITY_CLASSES:
+                    return 400, {"error": f"Unknown priority {priority!r}, expected one of "
+                                          f"{', '.join(PRIORITY_CLASSES)}"}
+                if not body.get("url"):
+                    return 400, {"error": "Missing 'url'"}
+                try:
+                    start = audio_downloader.parse_timestamp(body.get("start"))
+                    end = audio_downloader.parse_timestamp(body.get("end"))
+                    policy = audio_downloader.make_format_policy(**(body.get("format") or {}))
+                    output = self.resolve_output(body.get("output"))
+                except (TypeError, ValueError) as e:
+                    return 400, {"error": str(e)}
+                job = scheduler.submit(Job(body["url"], output, start, end, policy,
+                                           profile=bool(body.get("profile")), priority=priority))
+                return 201, {"job": job.to_dict()}
+        elif parts == ["stats"] and method == "GET":
+            return 200, {"workers": scheduler.workers, "classes": scheduler.stats()}
+        elif len(parts) >= 2 and parts[0] == "jobs":
+            job = scheduler.get(parts[1])
+            if job is None:
+                return 404, {"error": f"No such job: {parts[1]}"}
+            if method == "GET" and len(parts) == 2:
+                return 200, {"job": job.to_dict(include_log=True)}
+            if (method == "DELETE" and len(parts) == 2) or \
+                    (method == "POST" and parts[2:] == ["cancel"]):
+                scheduler.cancel(job.id)
+                return 200, {"job": job.to_dict()}
+        return 404, {"error": f"Unknown endpoint: {method} /{'/'.join(parts)}"}
+
+class JSONRequestHandler(BaseHTTPRequestHandler):
+    """Request handler that forwards JSON requests to ``server.app.handle``."""
+
+    def _refusal(self, method):
+        """
+        Check a request for signs that a web page forged it.
+
+        Returns:
+            tuple: (HTTP status, error message), or None if the request is acceptable
+        """
+        server = self.server
+        host = urlparse("//" + self.headers.get("Host", "")).hostname or ""
+        if server.allowed_hosts is not None and host.lower() not in server.allowed_hosts:
+            # A DNS name rebound to this address
+            return 403, f"Host not allowed: {host}"
+        origin = self.headers.get("Origin")
+        if origin and urlparse(origin).netloc != self.headers.get("Host"):
+            return 403, f"Cross-origin requests are not allowed: {origin}"
+        if method != "GET":
+            content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                # Browsers send other types cross-origin without a preflight
+                return 415, "Requests must be sent as application/json"
+        if server.token is not None:
+            scheme, _, token = (self.headers.get("Authorization") or "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), server.token):
+                return 401, "Missing or wrong API token"
+        return None
+
+    def _dispatch(self, method):
+        refusal = self._refusal(method)
+        if refusal is not None:
+            status, payload = refusal[0], {"error": refusal[1]}
+        else:
+            status, payload = self._handle(method)
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            parts = [part for part in urlparse(self.path).path.split("/") if part]
+            status, payload = self.server.app.handle(method, parts, body)
+        except ValueError as e:
+            status, payload = 400, {"error": f"Invalid request: {e}"}
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+        return status, payload
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        # Unix socket peers have no address; keep request logs off job output
+        sys.__stderr__.write("%s\n" % (format % args))
+
+UNIX_SOCKETS = hasattr(socket, "AF_UNIX")  # False on Windows
+
+if UNIX_SOCKETS:
+    class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+def parse_address(address):
+    """
+    Parse a daemon address.
+
+    Args:
+        address (str): ``http://host:port``, ``host:port`` or ``unix:///path/to.sock``
+
+    Returns:
+        tuple: ("unix", path) or ("tcp", (host, port))
+    """
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    if "://" not in address:
+        address = "http://" + address
+    parsed = urlparse(address)
+    return "tcp", (parsed.hostname or "127.0.0.1", parsed.port or 8765)
+
+def check_address(address):
+    """
+    Check that ``address`` can be used on this platform.
+
+    Raises:
+        ValueError: For unix:// addresses where Unix sockets are not available
+    """
+    if parse_address(address)[0] == "unix" and not UNIX_SOCKETS:
+        raise ValueError(f"Unix socket addresses are not supported on this platform: {address} "
+                         f"(use http://host:port instead)")
+
+def load_token(path=TOKEN_PATH):
+    """
+    Get the API token clients send: $AUDIO_DOWNLOADER_TOKEN, or the token
+    file a server on this host wrote.
+
+    Returns:
+        str: The token, or None if there is none
+    """
+    token = os.environ.get(TOKEN_ENV)
+    if token:
+        return token.strip()
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def server_token(path=TOKEN_PATH):
+    """
+    Get the token a TCP server requires, creating a random one in ``path``
+    (readable only by the current user) on first use.
+
+    Returns:
+        str: The token
+    """
+    token = load_token(path)
+    if token:
+        return token
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another server created it meanwhile
+        return load_token(path)
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(fd, "w") as f:
+        f.write(token + "\n")
+    return token
+
+def _allowed_hosts(host):
+    """Host header values a TCP server bound to ``host`` accepts, or None for any."""
+    if host in ("", "0.0.0.0", "::"):
+        return None
+    hosts = {host.lower()}
+    try:
+        loopback = ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = host.lower() == "localhost"
+    if loopback:
+        hosts.update(("localhost", "127.0.0.1", "::1"))
+    return hosts
+
+def make_server(address, app, handler=JSONRequestHandler, token=None):
+    """
+    Create a threaded HTTP server for ``app`` on a TCP port or Unix socket.
+
+    Args:
+        address (str): Address accepted by parse_address
+        app: Object with a ``handle(method, parts, body)`` method
+        token (str, optional): API token for TCP listeners, defaults to server_token().
+                               Unix sockets are only reachable by their owner and need none.
+
+    Returns:
+        socketserver.BaseServer: The bound server
+    """
+    kind, target = parse_address(address)
+    check_address(address)
+    if kind == "unix":
+        if os.path.exists(target):
+            os.unlink(target)
+        server = ThreadingUnixHTTPServer(target, handler)
+        os.chmod(target, 0o600)
+        server.token = token
+        server.allowed_hosts = None
+    else:
+        server = ThreadingHTTPServer(target, handler)
+        server.daemon_threads = True
+        server.token = token or server_token()
+        server.allowed_hosts = _allowed_hosts(target[0])
+    server.app = app
+    return server
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+class DaemonClient:
+    """Thin client for a running download daemon."""
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=10, token=None):
+        self.address = address
+        self.timeout = timeout
+        self.token = token or load_token()
+
+    def _connection(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            try:
+                check_address(self.address)
+            except ValueError as e:
+                raise DaemonError(str(e))
+            return _UnixHTTPConnection(target, self.timeout)
+        return http.client.HTTPConnection(*target, timeout=self.timeout)
+
+    def request(self, method, path, payload=None):
+        conn = self._connection()
+        try:
+            body = json.dumps(payload) if payload is not None else None
+            headers = {"Content-Type": "application/json"}
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = json.loads(response.read() or b"{}")
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            raise DaemonError(f"Could not reach daemon at {self.address}: {e}")
+        finally:
+            conn.close()
+        if response.status >= 400:
+            raise DaemonError(data.get("error", f"HTTP {response.status}"))
+        return data
+
+    def submit(self, url, output_path=None, start=None, end=None, policy=None, profile=False,
+               priority=DEFAULT_PRIORITY):
+        payload = {"url": url, "output": output_path, "start": start, "end": end,
+                   "format": policy._asdict() if policy else None, "profile": profile,
+                   "priority": priority}
+        return self.request("POST", "/jobs", payload)["job"]
+
+    def status(self, job_id):
+        return self.request("GET", f"/jobs/{job_id}")["job"]
+
+    def cancel(self, job_id):
+        return self.request("POST", f"/jobs/{job_id}/cancel")["job"]
+
+    def list(self):
+        return self.request("GET", "/jobs")["jobs"]
+
+    def stats(self):
+        return self.request("GET", "/stats")["classes"]
+
+    def wait(self, job_id, on_log=print, interval=0.5):
+        """
+        Poll a job until it finishes, passing new log lines to ``on_log``.
+
+        Returns:
+            dict: The finished job
+        """
+        seen = 0
+        while True:
+            job = self.status(job_id)
+            new = job["log_count"] - seen
+            if new > 0:
+                for line in job["log"][-new:]:
+                    on_log(line)
+                seen = job["log_count"]
+            if job["state"] not in ("queued", "running", "paused"):
+                return job
+            time.sleep(interval)
+
+def serve(address=DEFAULT_ADDRESS, workers=2, use_cookies=True, profile_dir=None, output_dir=None, token=None):
+    """
+    Run the daemon until interrupted.
+
+    Args:
+        address (str): Address to listen on (see parse_address)
+        workers (int): Number of concurrent download jobs
+        use_cookies (bool): Whether to extract browser cookies for YouTube
+        profile_dir (str, optional): Profile every job and write the reports here
+        output_dir (str, optional): Directory that job output is confined to; the
+                                    daemon runs in it, so untitled downloads land there too
+        token (str, optional): API token for TCP listeners (see server_token)
+    """
+    if output_dir:
+        profile_dir = os.path.abspath(profile_dir) if profile_dir else None
+        os.makedirs(output_dir, exist_ok=True)
+        os.chdir(output_dir)
+    daemon = DownloadDaemon(workers=workers, use_cookies=use_cookies, profile_dir=profile_dir,
+                            profile_all=bool(profile_dir))
+    server = make_server(address, daemon, token=token)
+    daemon.start()
+    print(f"Audio downloader daemon listening on {address} with {workers} workers, "
+          f"writing to {daemon.output_dir}")
+    if server.token and not token and not os.environ.get(TOKEN_ENV):
+        print(f"API token: {TOKEN_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        daemon.close()
+        kind, target = parse_address(address)
+        if kind == "unix" and os.path.exists(target):
+            os.unlink(target)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the audio downloader daemon.')
+    parser.add_argument('--listen', default=DEFAULT_ADDRESS,
+                        help=f'Address to listen on, http://host:port or unix:///path (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('-w', '--workers', type=int, default=2, help='Number of concurrent downloads')
+    parser.add_argument('--no-cookies', action='store_true', help='Do not use browser cookies')
+    parser.add_argument('--profile', nargs='?', const='profiles', metavar='DIR',
+                        help='Profile every job and write reports to DIR (default: profiles); '
+                             'without it, only jobs submitted with "profile": true are profiled')
+    parser.add_argument('--output-dir', metavar='DIR',
+                        help='Directory job output is confined to (default: the current directory)')
+
+    args = parser.parse_args()
+    try:
+        check_address(args.listen)
+    except ValueError as e:
+        parser.error(str(e))
+    serve(args.listen, args.workers, use_cookies=not args.no_cookies, profile_dir=args.profile,
+          output_dir=args.output_dir)
+
+if __name__ == "__main__":
+    main()
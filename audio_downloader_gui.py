@@ -5,7 +5,7 @@ import threading
 import queue
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                            QFileDialog, QMessageBox, QProgressBar, QTextEdit)
+                            QFileDialog, QMessageBox, QProgressBar, QTextEdit, QCheckBox)
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject
 import audio_downloader
 
@@ -56,6 +56,22 @@ class AudioDownloaderApp(QMainWindow):
         output_layout.addWidget(browse_button)
         main_layout.addLayout(output_layout)
         
+        # Optional time range (e.g. for previews)
+        range_layout = QHBoxLayout()
+        self.start_input = QLineEdit()
+        self.start_input.setPlaceholderText('Start (e.g. 1:30)')
+        self.end_input = QLineEdit()
+        self.end_input.setPlaceholderText('End (blank for whole file)')
+        range_layout.addWidget(QLabel('From:'))
+        range_layout.addWidget(self.start_input)
+        range_layout.addWidget(QLabel('To:'))
+        range_layout.addWidget(self.end_input)
+        main_layout.addLayout(range_layout)
+        
+        # Write a CPU/memory profile report for the download (slows it down)
+        self.profile_checkbox = QCheckBox('Profile CPU and memory use')
+        main_layout.addWidget(self.profile_checkbox)
+        
         # Progress display - using a text edit for better log display
         self.progress_text = QTextEdit()
         self.progress_text.setReadOnly(True)
@@ -120,7 +136,7 @@ class AudioDownloaderApp(QMainWindow):
         except queue.Empty:
             pass
     
-    def download_worker(self, url, output_path):
+    def download_worker(self, url, output_path, start=None, end=None, profile=False):
         """Worker function that runs in a separate thread"""
         try:
             # Custom print function to send messages to the main thread
@@ -135,8 +151,25 @@ class AudioDownloaderApp(QMainWindow):
             builtins.print = thread_print
             
             try:
-                # Perform the download
-                result = audio_downloader.download_audio(url, output_path)
+                # Perform the download, on a running daemon if one is configured
+                daemon_address = os.environ.get('AUDIO_DOWNLOADER_DAEMON')
+                if daemon_address:
+                    from audio_downloader_daemon import DaemonClient
+                    client = DaemonClient(daemon_address)
+                    job = client.submit(url, output_path, start=start, end=end, profile=profile,
+                                        priority='interactive')
+                    job = client.wait(job['id'], on_log=thread_print)
+                    if job['profile']:
+                        thread_print(f"Profile report (on the daemon host): {job['profile']}")
+                    if job['state'] != 'done':
+                        raise Exception(job['error'] or f"Job {job['state']}")
+                    result = job['result']
+                elif profile:
+                    from audio_downloader_profiling import profile_job
+                    with profile_job(output_path or url):
+                        result = audio_downloader.download_audio(url, output_path, start=start, end=end)
+                else:
+                    result = audio_downloader.download_audio(url, output_path, start=start, end=end)
                 
                 if result:
                     self.message_queue.put(("finished", f"Download completed: {result}"))
@@ -157,6 +190,13 @@ class AudioDownloaderApp(QMainWindow):
             QMessageBox.warning(self, "Input Error", "Please enter a URL")
             return
         
+        try:
+            start = audio_downloader.parse_timestamp(self.start_input.text().strip())
+            end = audio_downloader.parse_timestamp(self.end_input.text().strip())
+        except ValueError:
+            QMessageBox.warning(self, "Input Error", "Times must be seconds or [hh:]mm:ss")
+            return
+        
         # Disable the download button during download
         self.download_button.setEnabled(False)
         self.update_progress("Starting download...")
@@ -164,7 +204,7 @@ class AudioDownloaderApp(QMainWindow):
         # Start the download in a separate thread
         self.download_thread = threading.Thread(
             target=self.download_worker,
-            args=(url, output_path if output_path else None)
+            args=(url, output_path if output_path else None, start, end, self.profile_checkbox.isChecked())
         )
         self.download_thread.daemon = True  # Thread will exit when main thread exits
         self.download_thread.start()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Fastest-mirror selection for direct downloads.
+
+Given several URLs that serve the same file, every mirror is probed
+concurrently with a small ranged request (time to first byte plus a short
+throughput sample) and the download starts from the fastest one. While the
+transfer runs, its throughput is watched; if the mirror stalls, fails or
+falls well behind what another mirror offered, the download continues from
+the next mirror with a ranged request at the current offset.
+
+Measured speeds are kept per host in a JSON file (~/.audio_downloader/mirrors.json
+by default) and blended into later rankings, so mirrors that were slow or
+unreliable in earlier runs start with a handicap.
+"""
+import os
+import sys
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+import audio_downloader
+
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser("~"), ".audio_downloader", "mirrors.json")
+PROBE_BYTES = 256 * 1024  # Bytes fetched from each mirror to measure throughput
+PROBE_TIMEOUT = (5, 10)  # Connect and read timeouts for probes
+STALL_TIMEOUT = 15  # Seconds without data before a mirror counts as failed
+SAMPLE_WINDOW = 3.0  # Seconds of transfer per throughput measurement
+DEGRADED_RATIO = 0.3  # Switch when below this fraction of another mirror's speed
+HISTORY_WEIGHT = 0.3  # Share of the learned speed in a mirror's score
+FAILURE_PENALTY = 0.5  # Score multiplier per recent failure
+
+MirrorProbe = namedtuple('MirrorProbe', ['url', 'ttfb', 'throughput', 'size', 'ranges', 'error'])
+MirrorProbe.__doc__ = """
+Result of probing one mirror.
+
+Fields:
+    url (str): The mirror URL
+    ttfb (float): Seconds until the response headers arrived
+    throughput (float): Bytes per second over the probe sample
+    size (int): Full file size, or None if the mirror did not report it
+    ranges (bool): Whether the mirror answers ranged requests, so a transfer can resume on it
+    error (str): Why the probe failed, or None
+"""
+
+class MirrorRanking:
+    """
+    Per-host mirror speeds learned across runs.
+
+    Speeds are kept as exponential moving averages together with a count of
+    recent failures. Safe to update from several threads; downloads in one
+    process share the instance from default_ranking(), and save() merges
+    with the file so processes sharing it keep each other's hosts.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self.hosts = self._load() if path else {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            return audio_downloader.load_json_state(self.path)
+        except (OSError, ValueError) as e:
+            # The history only orders mirrors; start over rather than fail downloads
+            print(f"Ignoring unreadable mirror history {self.path}: {e}")
+            return {}
+
+    def record(self, url, throughput=None, ttfb=None, failed=False):
+        """
+        Fold one measurement of a mirror into its history.
+
+        Args:
+            url (str): The mirror URL; history is kept per host
+            throughput (float, optional): Measured bytes per second
+            ttfb (float, optional): Measured time to first byte in seconds
+            failed (bool): The mirror failed or stalled
+        """
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            entry = self.hosts.setdefault(host, {'throughput': None, 'ttfb': None, 'failures': 0})
+            if failed:
+                entry['failures'] += 1
+            else:
+                entry['failures'] = max(0, entry['failures'] - 1)
+            for field, value in (('throughput', throughput), ('ttfb', ttfb)):
+                if value is not None:
+                    previous = entry[field]
+                    entry[field] = value if previous is None else 0.5 * previous + 0.5 * value
+            entry['updated'] = time.time()
+
+    def score(self, url, throughput=None):
+        """
+        Estimate a mirror's speed from a fresh measurement and its history.
+
+        Returns:
+            float: Expected bytes per second (0 if nothing is known)
+        """
+        with self._lock:
+            entry = self.hosts.get(urlparse(url).netloc.lower(), {})
+        learned = entry.get('throughput')
+        if throughput is None:
+            estimate = learned or 0
+        elif learned is None:
+            estimate = throughput
+        else:
+            estimate = (1 - HISTORY_WEIGHT) * throughput + HISTORY_WEIGHT * learned
+        return estimate * FAILURE_PENALTY ** min(entry.get('failures', 0), 5)
+
+    def save(self):
+        """Write the history, keeping the newer entry of hosts also updated on disk."""
+        if not self.path:
+            return
+        with _save_lock:
+            on_disk = self._load()
+            with self._lock:
+                for host, entry in on_disk.items():
+                    if entry.get('updated', 0) > self.hosts.get(host, {}).get('updated', 0):
+                        self.hosts[host] = entry
+                hosts = dict(self.hosts)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            audio_downloader.save_json_state(self.path, hosts)
+
+_save_lock = threading.Lock()  # Serializes the read-merge-write of save() in this process
+_default_ranking = None
+_default_ranking_lock = threading.Lock()
+
+def default_ranking():
+    """
+    Get the process-wide ranking backed by DEFAULT_STATE_PATH, loading it on first use.
+
+    Returns:
+        MirrorRanking: The shared instance
+    """
+    global _default_ranking
+    with _default_ranking_lock:
+        if _default_ranking is None:
+            _default_ranking = MirrorRanking()
+        return _default_ranking
+
+def probe_mirror(url, sample_bytes=PROBE_BYTES):
+    """
+    Measure a mirror's time to first byte and throughput with a ranged request.
+
+    Returns:
+        MirrorProbe: The measurement; ``error`` is set if the mirror is unusable
+    """
+    session = audio_downloader.get_session()
+    started = time.perf_counter()
+    try:
+        response = session.get(url, headers={'Range': f'bytes=0-{sample_bytes - 1}'},
+                               stream=True, timeout=PROBE_TIMEOUT)
+        with response:
+            ttfb = time.perf_counter() - started
+            response.raise_for_status()
+            received = 0
+            for chunk in response.iter_content(chunk_size=16384):
+                received += len(chunk)
+                if received >= sample_bytes:
+                    break
+            elapsed = max(time.perf_counter() - started - ttfb, 1e-6)
+            ranges = response.status_code == 206
+            if ranges:
+                total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                size = int(total) if total.isdigit() else None
+            else:
+                size = int(response.headers.get('content-length', 0)) or None
+    except requests.RequestException as e:
+        return MirrorProbe(url, None, 0, None, False, str(e))
+    return MirrorProbe(url, ttfb, received / elapsed, size, ranges, None)
+
+def rank_mirrors(urls, ranking=None):
+    """
+    Probe mirrors concurrently and order the usable ones fastest first.
+
+    Mirrors are ranked by the estimated time to fetch the whole file: time to
+    first byte plus size over the expected throughput, with the expected
+    throughput blended from this probe and the learned history. Mirrors that
+    report a different size than the best one are dropped, since they do not
+    serve the same file.
+
+    Args:
+        urls (list): Equivalent URLs
+        ranking (MirrorRanking, optional): History to use and update
+
+    Returns:
+        list: MirrorProbe results for usable mirrors, best first
+    """
+    # Probe threads share the caller's connection pool
+    downloader = audio_downloader._current_downloader()
+
+    def probe(url):
+        with downloader.activate():
+            return probe_mirror(url)
+
+    with ThreadPoolExecutor(max_workers=min(len(urls), 8)) as executor:
+        probes = list(executor.map(probe, urls))
+
+    def expected_seconds(probe):
+        speed = ranking.score(probe.url, probe.throughput) if ranking is not None else probe.throughput
+        return probe.ttfb + (probe.size or PROBE_BYTES) / max(speed, 1)
+
+    for probe in probes:
+        if probe.error:
+            print(f"Mirror unavailable: {probe.url} ({probe.error})")
+    usable = sorted((probe for probe in probes if not probe.error), key=expected_seconds)
+    if ranking is not None:
+        for probe in probes:
+            ranking.record(probe.url, probe.throughput or None, probe.ttfb, failed=probe.error is not None)
+    if usable and usable[0].size:
+        size = usable[0].size
+        for probe in usable[1:]:
+            if probe.size and probe.size != size:
+                print(f"Skipping mirror with a different file size ({probe.size} != {size}): {probe.url}")
+        usable = [probe for probe in usable if not probe.size or probe.size == size]
+    for probe in usable:
+        print(f"Mirror {probe.url}: first byte {probe.ttfb * 1000:.0f} ms, "
+              f"{probe.throughput / 1024:.0f} KiB/s")
+    return usable
+
+class _MirrorDegraded(Exception):
+    """The current mirror fell behind another one."""
+
+def _open_at(url, offset, total_size):
+    """
+    Open a mirror at a byte offset, checking that it resumes the same file.
+
+    Returns:
+        requests.Response: A streaming response positioned at ``offset``
+    """
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    response = audio_downloader.get_session().get(url, headers=headers, stream=True,
+                                                  timeout=(PROBE_TIMEOUT[0], STALL_TIMEOUT))
+    response.raise_for_status()
+    if offset:
+        content_range = response.headers.get('Content-Range', '')
+        if response.status_code != 206 or not content_range.startswith(f'bytes {offset}-'):
+            response.close()
+            raise requests.RequestException(f"Mirror did not resume at byte {offset}")
+        total = content_range.rpartition('/')[2]
+        if total_size and total.isdigit() and int(total) != total_size:
+            response.close()
+            raise requests.RequestException(f"Mirror serves a different file ({total} bytes)")
+    return response
+
+class _CountingWriter:
+    """Wraps a file or sink writer and counts the bytes written, i.e. the resume offset."""
+
+    def __init__(self, f):
+        self.f = f
+        self.written = 0
+
+    def write(self, data):
+        self.f.write(data)
+        self.written += len(data)
+
+def _transfer(response, out, total_size, fallback_speed):
+    """
+    Copy a response into ``out`` (a _CountingWriter), watching its throughput.
+
+    Raises _MirrorDegraded if a full sample window runs below DEGRADED_RATIO
+    of ``fallback_speed`` (the best alternative mirror's expected speed).
+
+    Returns:
+        float: Measured bytes per second
+    """
+    started = window_start = time.perf_counter()
+    first = out.written
+    window_bytes = 0
+    for chunk in response.iter_content(chunk_size=65536):
+        audio_downloader.check_cancelled()
+        if not chunk:
+            continue
+        out.write(chunk)
+        window_bytes += len(chunk)
+        if total_size:
+            percent = int(100 * out.written / total_size)
+            sys.stdout.write(f"\rDownloading: {percent}% [{out.written} / {total_size} bytes]")
+            sys.stdout.flush()
+
+        now = time.perf_counter()
+        if now - window_start >= SAMPLE_WINDOW:
+            rate = window_bytes / (now - window_start)
+            if fallback_speed and rate < DEGRADED_RATIO * fallback_speed:
+                raise _MirrorDegraded(rate)
+            window_start, window_bytes = now, 0
+    return (out.written - first) / max(time.perf_counter() - started, 1e-6)
+
+def download_from_mirrors(urls, output_path=None, sink=None, ranking=None):
+    """
+    Download a file from the fastest of several equivalent URLs.
+
+    Args:
+        urls (list): URLs serving the same file
+        output_path (str, optional): Where to save the file; named after the
+                                     first mirror's response if not given
+        sink (optional): Output sink from audio_downloader_storage
+        ranking (MirrorRanking, optional): Learned mirror speeds, defaults to
+                                           the process-wide default_ranking()
+
+    Returns:
+        str: Path (or sink location) of the downloaded file, or None if every mirror failed
+    """
+    urls = list(dict.fromkeys(urls))
+    if ranking is None:
+        ranking = default_ranking()
+    print(f"Probing {len(urls)} mirrors...")
+    candidates = rank_mirrors(urls, ranking)
+    if not candidates:
+        print("No mirror is reachable.")
+        ranking.save()
+        return None
+
+    total_size = candidates[0].size or 0
+    f = writer = out = None
+    switches = 0
+
+    def discard():
+        if writer is not None:
+            writer.abort()
+        elif f is not None:
+            f.close()
+            os.unlink(output_path)
+
+    try:
+        while candidates:
+            current = candidates.pop(0)
+            offset = out.written if out else 0
+            # Resuming needs ranged requests; a mirror without them can only start from zero
+            if offset and not current.ranges:
+                continue
+            fallback = [probe for probe in candidates if probe.ranges]
+            fallback_speed = max((ranking.score(probe.url, probe.throughput) for probe in fallback), default=0)
+            try:
+                response = _open_at(current.url, offset, total_size)
+                with response:
+                    if f is None:
+                        output_path = output_path or audio_downloader._output_name(current.url, response)
+                        if sink is not None:
+                            f = writer = sink.open(output_path)
+                            print(f"Streaming to: {sink.location(output_path)}")
+                        else:
+                            f = open(output_path, 'wb')
+                            print(f"Saving to: {output_path}")
+                        out = _CountingWriter(f)
+                    print(f"Downloading from: {current.url}" + (f" (resuming at byte {offset})" if offset else ""))
+                    speed = _transfer(response, out, total_size, fallback_speed)
+                if total_size and out.written < total_size:
+                    raise requests.RequestException(f"Transfer ended early at byte {out.written}")
+                ranking.record(current.url, throughput=speed)
+                break
+            except _MirrorDegraded as e:
+                rate = e.args[0]
+                ranking.record(current.url, throughput=rate)
+                print(f"\nMirror slowed to {rate / 1024:.0f} KiB/s, switching: {current.url}")
+                # Keep it as a last resort in case the others turn out worse
+                if switches < 2 * len(urls):
+                    candidates.append(current._replace(throughput=rate))
+            except requests.RequestException as e:
+                ranking.record(current.url, failed=True)
+                print(f"\nMirror failed ({e}): {current.url}")
+            switches += 1
+        else:
+            print("\nAll mirrors failed.")
+            discard()
+            return None
+    except BaseException:
+        discard()
+        raise
+    finally:
+        ranking.save()
+
+    if writer is not None:
+        output_path = writer.close()
+    else:
+        f.close()
+    print("\nDownload complete!")
+    return output_path
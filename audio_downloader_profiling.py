@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Per-job CPU and memory profiling.
+
+profile_job() wraps one download in cProfile (deterministic, for the calling
+thread) and tracemalloc, then writes two files per job:
+
+    <dir>/<name>.prof   pstats data; open with ``python -m pstats`` or snakeviz
+    <dir>/<name>.txt    summary: wall and CPU time, CPU used by yt-dlp/ffmpeg
+                        child processes, peak traced memory, and the top-N
+                        functions and allocation sites
+
+Profiling is off unless asked for (``--profile`` on the CLI and the daemon,
+``"profile": true`` in a daemon job, the Profile box in the GUI), because it
+slows pure-Python code down and tracemalloc adds memory per allocation.
+"""
+import io
+import os
+import re
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+DEFAULT_PROFILE_DIR = "profiles"
+TOP_N = 20
+TRACEMALLOC_FRAMES = 1  # Allocation sites are reported by their innermost line
+
+_tracing_lock = threading.Lock()
+_tracing_jobs = 0  # Profiled jobs currently relying on tracemalloc
+_started_tracing = False  # Whether we started tracemalloc (and so should stop it)
+
+def _start_tracing():
+    global _tracing_jobs, _started_tracing
+    with _tracing_lock:
+        if _tracing_jobs == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _started_tracing = True
+        _tracing_jobs += 1
+
+def _stop_tracing():
+    global _tracing_jobs, _started_tracing
+    with _tracing_lock:
+        _tracing_jobs -= 1
+        if _tracing_jobs == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+def _children_cpu():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('_')[:80] or "job"
+
+class JobProfile:
+    """
+    Measurements of one profiled job, filled in when its profile_job() block exits.
+
+    Attributes:
+        name (str): Job name used for the output files
+        profile_path (str): Path of the pstats file, or None if CPU profiling was skipped
+        report_path (str): Path of the text summary
+        wall (float): Wall-clock seconds
+        cpu (float): CPU seconds used by the job's thread
+        children_cpu (float): CPU seconds of child processes (yt-dlp, ffmpeg) that exited meanwhile
+        peak_memory (int): Peak traced Python memory in bytes
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.profile_path = None
+        self.report_path = None
+        self.wall = None
+        self.cpu = None
+        self.children_cpu = None
+        self.peak_memory = None
+
+@contextmanager
+def profile_job(name, directory=DEFAULT_PROFILE_DIR, top=TOP_N):
+    """
+    Profile the code run inside the block and write its report.
+
+    cProfile only sees the calling thread, so the block should run the whole
+    job on it. Child-process CPU and memory figures are process-wide: when
+    several jobs run at once (daemon, batch workers) they include the others.
+
+    Args:
+        name (str): Job name for the output files
+        directory (str): Directory for the .prof and .txt files
+        top (int): Number of functions and allocation sites in the summary
+
+    Yields:
+        JobProfile: Filled in once the block exits
+    """
+    os.makedirs(directory, exist_ok=True)
+    job = JobProfile(name)
+    base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{_safe_name(name)}")
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one active cProfile per process
+        profiler = None
+    _start_tracing()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    children_before = _children_cpu()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield job
+    finally:
+        job.wall = time.perf_counter() - wall_start
+        job.cpu = time.thread_time() - cpu_start
+        if profiler is not None:
+            profiler.disable()
+        children_after = _children_cpu()
+        if children_before is not None:
+            job.children_cpu = children_after - children_before
+        job.peak_memory = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+        _stop_tracing()
+
+        if profiler is not None:
+            job.profile_path = base + ".prof"
+            profiler.dump_stats(job.profile_path)
+        job.report_path = base + ".txt"
+        with open(job.report_path, "w") as f:
+            f.write(_report(job, profiler, before, after, top))
+        print(f"Profile: {job.wall:.1f}s wall, {job.cpu:.2f}s CPU, "
+              f"peak {job.peak_memory / 1024 / 1024:.1f} MiB traced -> {job.report_path}")
+
+def _report(job, profiler, before, after, top):
+    lines = [
+        f"Job: {job.name}",
+        f"Wall time: {job.wall:.3f} s",
+        f"CPU time (job thread): {job.cpu:.3f} s",
+        "CPU time (child processes): " + (
+            f"{job.children_cpu:.3f} s" if job.children_cpu is not None else "not available on this platform"
+        ),
+        f"Peak traced memory: {job.peak_memory / 1024 / 1024:.2f} MiB",
+        "",
+    ]
+    if profiler is not None:
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+        lines += [f"Top {top} functions by cumulative time:", stream.getvalue().strip(), ""]
+    else:
+        lines += ["CPU profile skipped: another job was already being profiled.", ""]
+
+    lines.append(f"Top {top} allocation sites (net growth during the job):")
+    for stat in after.compare_to(before, "lineno")[:top]:
+        frame = stat.traceback[0]
+        lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB  {stat.count_diff:+7d} blocks  "
+                     f"{frame.filename}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
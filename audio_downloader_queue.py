@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Persistent, crash-safe job queue for large batch runs.
+
+Jobs live in an SQLite database (WAL journal) with their state, attempt count
+and last error, so a batch that is killed part-way resumes only unfinished
+work when it is restarted. Running jobs hold a time-limited lease that the
+worker renews with heartbeats; jobs left running by a dead process are
+reclaimed once their lease expires.
+"""
+import os
+import time
+import shutil
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import audio_downloader
+
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+DEFAULT_LEASE = 300  # Seconds a claimed job stays reserved without a heartbeat
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 30  # Seconds before the first retry of a failed job; doubles per attempt
+RETRY_POLL = 5  # Longest sleep of an idle worker waiting for a backoff to pass
+DISK_MARGIN = 256 * 1024 * 1024  # Bytes always left free on the output filesystem
+
+# Claim orders. Jobs of unknown size go last; 'fair' alternates between the
+# smallest and the largest job so neither kind starves.
+ORDERS = {
+    'fifo': "id",
+    'shortest': "size IS NULL, size, id",
+    'largest': "size IS NULL, size DESC, id",
+}
+ORDER_CHOICES = tuple(ORDERS) + ('fair',)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    output TEXT,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    lease_owner TEXT,
+    lease_expires REAL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    size INTEGER,
+    planned INTEGER NOT NULL DEFAULT 0,
+    not_before REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires);
+"""
+
+# Columns added after the first release, for queue files created before them
+MIGRATIONS = {
+    'size': "ALTER TABLE jobs ADD COLUMN size INTEGER",
+    'planned': "ALTER TABLE jobs ADD COLUMN planned INTEGER NOT NULL DEFAULT 0",
+    'not_before': "ALTER TABLE jobs ADD COLUMN not_before REAL",
+}
+
+def default_owner():
+    """
+    Build a lease owner name that is unique per process and thread.
+
+    Returns:
+        str: ``host:pid:thread``
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+class JobQueue:
+    """
+    SQLite-backed job queue with leases.
+
+    Each thread gets its own connection; state changes run in short
+    ``BEGIN IMMEDIATE`` transactions so several processes can share one file.
+    Jobs are claimed in the given ``order`` (see ORDER_CHOICES), using the
+    sizes recorded by plan(). A failed attempt is retried after an
+    exponential backoff starting at ``retry_backoff`` seconds.
+    """
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS, order='fifo',
+                 retry_backoff=RETRY_BACKOFF):
+        if order not in ORDER_CHOICES:
+            raise ValueError(f"Unknown order '{order}', expected one of: {', '.join(ORDER_CHOICES)}")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.order = order
+        self._claims = 0
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(statement)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def add(self, urls):
+        """
+        Add jobs, ignoring URLs whose canonical key is already in the queue.
+
+        Args:
+            urls (iterable): URLs, or (url, output_path) tuples
+
+        Returns:
+            int: Number of new jobs
+        """
+        now = time.time()
+        rows = []
+        for item in urls:
+            url, output = (item, None) if isinstance(item, str) else item
+            rows.append((audio_downloader.canonicalize_url(url).key, url, output, now, now))
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, url, output, created, updated) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            return conn.total_changes - before
+
+    def _reclaim_expired(self, conn, now):
+        # Jobs whose worker stopped heartbeating go back to the queue, unless
+        # they have used up their attempts
+        conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "last_error = 'Lease expired (worker lost)', lease_owner = NULL, lease_expires = NULL, updated = ? "
+            "WHERE state = 'running' AND lease_expires < ?",
+            (self.max_attempts, now, now)
+        )
+
+    def _order_by(self):
+        if self.order != 'fair':
+            return ORDERS[self.order]
+        self._claims += 1
+        return ORDERS['largest' if self._claims % 2 else 'shortest']
+
+    def claim(self, owner, limit=1, lease_seconds=None, max_size=None):
+        """
+        Claim up to ``limit`` queued jobs under a lease. Jobs waiting out a
+        retry backoff are skipped.
+
+        Args:
+            owner (str): Lease owner name (see default_owner)
+            limit (int): Maximum number of jobs to claim
+            lease_seconds (float, optional): Lease length, defaults to the queue's
+            max_size (int, optional): Only claim jobs expected to need at most
+                                      this many bytes (or of unknown size)
+
+        Returns:
+            list: Claimed jobs as sqlite3.Row objects
+        """
+        now = time.time()
+        expires = now + (lease_seconds or self.lease_seconds)
+        size_filter = "" if max_size is None else " AND (size IS NULL OR size <= ?)"
+        params = [now] + ([] if max_size is None else [max_size]) + [limit]
+        with self._transaction() as conn:
+            self._reclaim_expired(conn, now)
+            ids = [row['id'] for row in conn.execute(
+                f"SELECT id FROM jobs WHERE state = 'queued' AND (not_before IS NULL OR not_before <= ?)"
+                f"{size_filter} ORDER BY {self._order_by()} LIMIT ?",
+                params
+            )]
+            if not ids:
+                return []
+            marks = ",".join("?" * len(ids))
+            conn.execute(
+                f"UPDATE jobs SET state = 'running', attempts = attempts + 1, lease_owner = ?, "
+                f"lease_expires = ?, updated = ? WHERE id IN ({marks})",
+                [owner, expires, now] + ids
+            )
+            rows = {row['id']: row for row in conn.execute(f"SELECT * FROM jobs WHERE id IN ({marks})", ids)}
+            return [rows[job_id] for job_id in ids]
+
+    def plan(self, estimate, workers=8):
+        """
+        Record the expected size of every queued job that has not been planned yet.
+
+        Args:
+            estimate (callable): Called with a URL, returns expected bytes or None
+            workers (int): Number of concurrent probes
+
+        Returns:
+            int: Number of jobs planned
+        """
+        rows = self._connection().execute(
+            "SELECT id, url FROM jobs WHERE state = 'queued' AND planned = 0"
+        ).fetchall()
+        if not rows:
+            return 0
+
+        def probe(row):
+            try:
+                return estimate(row['url']), row['id']
+            except Exception as e:
+                print(f"Could not estimate the size of {row['url']}: {e}")
+                return None, row['id']
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sizes = list(executor.map(probe, rows))
+        with self._transaction() as conn:
+            conn.executemany("UPDATE jobs SET size = ?, planned = 1 WHERE id = ?", sizes)
+        return len(sizes)
+
+    def reject_oversized(self, max_size):
+        """
+        Fail queued jobs that need more than ``max_size`` bytes; they cannot
+        fit on the output filesystem however long they wait.
+
+        Returns:
+            int: Number of jobs failed
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'failed', last_error = 'Needs ' || size || ' bytes, only ' || ? || "
+                "' available on the output filesystem', updated = ? WHERE state = 'queued' AND size > ?",
+                (max(max_size, 0), time.time(), max_size)
+            )
+            return cursor.rowcount
+
+    def heartbeat(self, job_ids, owner, lease_seconds=None):
+        """
+        Extend the leases ``owner`` holds on the given jobs.
+
+        Returns:
+            int: Number of leases extended; lower than requested if some were lost
+        """
+        if not job_ids:
+            return 0
+        now = time.time()
+        marks = ",".join("?" * len(job_ids))
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET lease_expires = ?, updated = ? "
+                f"WHERE state = 'running' AND lease_owner = ? AND id IN ({marks})",
+                [now + (lease_seconds or self.lease_seconds), now, owner] + list(job_ids)
+            )
+            return cursor.rowcount
+
+    def complete(self, job_id, owner, result=None):
+        """
+        Mark a job done.
+
+        Returns:
+            bool: False if the lease was lost to another worker
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'done', result = ?, last_error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated = ? WHERE id = ? AND lease_owner = ?",
+                (result, time.time(), job_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id, owner, error, permanent=False):
+        """
+        Record a failed attempt. The job is queued again after a backoff that
+        doubles with each attempt, until it has used up its attempts; then,
+        or straight away for a permanent error, it is marked failed.
+
+        Args:
+            permanent (bool): The error will not go away on retry (e.g. HTTP 404)
+
+        Returns:
+            bool: False if the lease was lost to another worker
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = CASE WHEN ? OR attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "not_before = ? + ? * (1 << (attempts - 1)), "
+                "last_error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (permanent, self.max_attempts, now, self.retry_backoff, error, now, job_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def retry_delay(self):
+        """
+        Seconds until the next queued job can be claimed.
+
+        Returns:
+            float: 0 if one is claimable now, None if no jobs are queued
+        """
+        row = self._connection().execute(
+            "SELECT COUNT(*), MIN(COALESCE(not_before, 0)) FROM jobs WHERE state = 'queued'"
+        ).fetchone()
+        if not row[0]:
+            return None
+        return max(0.0, row[1] - time.time())
+
+    def retry_failed(self):
+        """
+        Queue failed jobs again with a fresh attempt count.
+
+        Returns:
+            int: Number of jobs re-queued
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'queued', attempts = 0, not_before = NULL, updated = ? WHERE state = 'failed'",
+                (time.time(),)
+            )
+            return cursor.rowcount
+
+    def output_dirs(self):
+        """
+        Directories that unfinished jobs write to.
+
+        Returns:
+            set: Absolute paths; jobs without an output path write to the current directory
+        """
+        rows = self._connection().execute("SELECT DISTINCT output FROM jobs WHERE state IN ('queued', 'running')")
+        return {os.path.dirname(os.path.abspath(output)) if output else os.getcwd() for (output,) in rows}
+
+    def counts(self):
+        """
+        Count jobs by state.
+
+        Returns:
+            dict: State name to number of jobs
+        """
+        counts = dict.fromkeys(JOB_STATES, 0)
+        rows = self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        for state, count in rows:
+            counts[state] = count
+        return counts
+
+def run_job(job, cookie_file=None, policy=None, sink=None, profile_dir=None, on_stored=None):
+    """
+    Run one queued job through the regular download entry point.
+
+    The job only counts as done once its output is stored. Without
+    ``on_stored`` this waits for the sink's upload; with it, run_job returns
+    as soon as the download finishes and the outcome is passed to
+    ``on_stored(result, error, permanent)`` when the upload completes, so the
+    caller can start its next download in the meantime. The callback may run
+    on an upload thread.
+
+    Args:
+        job: Job row with ``url`` and ``output`` fields
+        cookie_file (str, optional): Browser cookie file for YouTube downloads
+        policy (FormatPolicy, optional): Bitrate/codec budget for YouTube downloads
+        sink (optional): Output sink from audio_downloader_storage
+        profile_dir (str, optional): Profile the job and write its report here
+        on_stored (callable, optional): Receives the outcome once the output is stored
+
+    Returns:
+        tuple: (result path or None, error message or None, whether the error is permanent),
+        or None when ``on_stored`` is given
+    """
+    audio_downloader.clear_last_error()
+    try:
+        with _profiled(f"job-{job['id']}", profile_dir):
+            result = audio_downloader.download_audio(job['url'], job['output'], cookie_file=cookie_file,
+                                                     policy=policy, sink=sink)
+    except (Exception, SystemExit) as e:
+        outcome = (None, str(e) or e.__class__.__name__, False)
+    else:
+        if result:
+            outcome = (result, None, False)
+        else:
+            outcome = (None, audio_downloader.last_error() or "Download failed",
+                       audio_downloader.last_error_permanent())
+    if outcome[0] is not None and sink is not None:
+        if on_stored is None:
+            try:
+                sink.wait(result)
+            except Exception as e:
+                return None, f"Upload failed: {e}", False
+            return outcome
+
+        def stored(error):
+            if error is None:
+                on_stored(*outcome)
+            else:
+                on_stored(None, f"Upload failed: {error}", False)
+
+        sink.when_stored(result, stored)
+        return None
+    if on_stored is None:
+        return outcome
+    on_stored(*outcome)
+    return None
+
+class _Heartbeat:
+    """Background thread that renews the leases of jobs this process is running."""
+
+    def __init__(self, queue, interval):
+        self.queue = queue
+        self.interval = interval
+        self.running = {}  # job id -> owner
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                by_owner = {}
+                for job_id, owner in self.running.items():
+                    by_owner.setdefault(owner, []).append(job_id)
+            for owner, job_ids in by_owner.items():
+                try:
+                    self.queue.heartbeat(job_ids, owner)
+                except sqlite3.Error as e:
+                    print(f"Heartbeat failed: {e}")
+
+    def track(self, job_id, owner):
+        with self.lock:
+            self.running[job_id] = owner
+
+    def untrack(self, job_id):
+        with self.lock:
+            self.running.pop(job_id, None)
+
+class DiskSpace:
+    """
+    Disk-space admission control for the output filesystem.
+
+    Every running job reserves its expected size, and a job is only claimed
+    when its size fits in the free space minus the outstanding reservations
+    and a safety margin. This is conservative: bytes a running download has
+    already written count against the free space and its reservation until
+    it finishes.
+    """
+
+    def __init__(self, path='.', margin=DISK_MARGIN):
+        self.path = os.path.abspath(path)
+        self.margin = margin
+        self.reserved = {}  # job id -> bytes
+        self.cond = threading.Condition()
+
+    def available(self):
+        return shutil.disk_usage(self.path).free - self.margin - sum(self.reserved.values())
+
+    def claim(self, queue, owner):
+        """
+        Claim the next job that fits and reserve its size. Waits while running
+        jobs may still free up their reservations, and fails jobs that cannot
+        fit even with nothing else running.
+
+        Returns:
+            list: The claimed job, or an empty list when nothing is left
+        """
+        with self.cond:
+            while True:
+                available = self.available()
+                jobs = queue.claim(owner, max_size=available)
+                if jobs:
+                    self.reserved[jobs[0]['id']] = jobs[0]['size'] or 0
+                    return jobs
+                if not queue.counts()['queued']:
+                    return []
+                if self.reserved:
+                    # The remaining jobs may fit once a running one finishes,
+                    # or become claimable once their retry backoff passes
+                    self.cond.wait(timeout=min(60, queue.retry_delay() or 60))
+                    continue
+                rejected = queue.reject_oversized(available)
+                if rejected:
+                    print(f"Failed {rejected} jobs that do not fit in the free space of {self.path}")
+                else:
+                    # Claimed by another process in the meantime
+                    return []
+
+    def release(self, job_id):
+        with self.cond:
+            self.reserved.pop(job_id, None)
+            self.cond.notify_all()
+
+def output_filesystem(queue):
+    """
+    Pick the directory to watch for a queue's DiskSpace: of the directories
+    its jobs write to, the one on the filesystem with the least free space.
+
+    Returns:
+        str: An existing directory (the nearest existing parent of one that
+             will be created)
+    """
+    def existing(path):
+        while not os.path.isdir(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        return path
+
+    return min((existing(path) for path in queue.output_dirs() or {os.getcwd()}),
+               key=lambda path: shutil.disk_usage(path).free)
+
+def _profiled(name, profile_dir):
+    if not profile_dir:
+        return nullcontext()
+    from audio_downloader_profiling import profile_job
+    return profile_job(name, profile_dir)
+
+def run_queue(queue, workers=2, cookie_file=None, policy=None, sink=None, disk=None, profile_dir=None):
+    """
+    Process queued jobs until none are left to claim.
+
+    Args:
+        queue (JobQueue): The queue to drain
+        workers (int): Number of concurrent downloads
+        cookie_file (str, optional): Browser cookie file for YouTube downloads
+        policy (FormatPolicy, optional): Bitrate/codec budget for YouTube downloads
+        sink (optional): Output sink from audio_downloader_storage
+        disk (DiskSpace, optional): Admit jobs only when their planned size fits on disk
+        profile_dir (str, optional): Profile every job and write the reports here
+
+    Returns:
+        dict: Job counts by state once the run finishes
+    """
+    heartbeat = _Heartbeat(queue, max(1, queue.lease_seconds / 3))
+    heartbeat.thread.start()
+    # Jobs claimed but not yet settled: downloading, or downloaded and still
+    # uploading. Their leases stay on the heartbeat until finish() runs.
+    uploading = set()
+    uploads_changed = threading.Condition()
+
+    def finish(job, owner, result, error, permanent):
+        try:
+            if error:
+                print(f"[job {job['id']}] failed{' permanently' if permanent else ''}: {error}")
+                queue.fail(job['id'], owner, error, permanent)
+            else:
+                queue.complete(job['id'], owner, result)
+        finally:
+            heartbeat.untrack(job['id'])
+            if disk:
+                disk.release(job['id'])
+            with uploads_changed:
+                uploading.discard(job['id'])
+                uploads_changed.notify_all()
+
+    def worker():
+        owner = default_owner()
+        while True:
+            with uploads_changed:
+                # Overlap uploads with downloads: each worker may have a download
+                # and one upload unsettled, no more
+                while len(uploading) >= 2 * workers:
+                    uploads_changed.wait()
+            jobs = disk.claim(queue, owner) if disk else queue.claim(owner)
+            if not jobs:
+                delay = queue.retry_delay()
+                with uploads_changed:
+                    if delay is None and not uploading:
+                        return
+                    # Jobs waiting out a retry backoff, or uploads that may still fail and be requeued
+                    uploads_changed.wait(RETRY_POLL if delay is None else min(max(delay, 0.1), RETRY_POLL))
+                continue
+            job = jobs[0]
+            heartbeat.track(job['id'], owner)
+            with uploads_changed:
+                uploading.add(job['id'])
+            print(f"[job {job['id']}] attempt {job['attempts']}: {job['url']}")
+            run_job(job, cookie_file, policy, sink, profile_dir,
+                    on_stored=lambda *outcome, job=job: finish(job, owner, *outcome))
+
+    threads = [threading.Thread(target=worker, name=f"queue-worker-{i}") for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    heartbeat.stopped.set()
+    return queue.counts()
+
+def read_batch_file(path):
+    """
+    Read a batch file with one URL per line, optionally followed by an output path.
+    Blank lines and lines starting with '#' are ignored.
+
+    Returns:
+        list: (url, output_path or None) tuples
+    """
+    items = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(None, 1)
+            items.append((parts[0], parts[1] if len(parts) > 1 else None))
+    return items
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Pluggable output sinks for downloaded audio.
+
+A sink receives finished bytes as they are produced. LocalSink writes to the
+filesystem; S3Sink streams direct downloads into an S3 multipart upload, so
+nothing is written to local disk, and uploads files produced by yt-dlp in the
+background while the next downloads run.
+
+S3Sink needs boto3 (``pip install boto3``) and works with any S3-compatible
+service through ``endpoint_url`` (MinIO, moto, Ceph, ...). Credentials come
+from the usual boto3 sources (environment, ~/.aws, instance roles).
+"""
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+class LocalSink:
+    """Writes output files below a local directory."""
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def location(self, name):
+        return os.path.join(self.root, name) if self.root else name
+
+    def open(self, name):
+        """
+        Open a writer for ``name``. Data goes to a .part file that is moved
+        into place when the writer is closed.
+
+        Returns:
+            LocalWriter: The writer
+        """
+        path = self.location(name)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return LocalWriter(path)
+
+    def put_file(self, path, name=None):
+        """
+        Store a finished file under the sink.
+
+        Returns:
+            str: The file's final path
+        """
+        target = self.location(name or os.path.basename(path)) if self.root else path
+        if os.path.abspath(target) != os.path.abspath(path):
+            if os.path.dirname(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        return target
+
+    def wait(self, location):
+        """Local writes finish synchronously; nothing to wait for."""
+
+    def when_stored(self, location, callback):
+        """Local writes finish synchronously; calls ``callback(None)`` right away."""
+        callback(None)
+
+    def flush(self):
+        """Local writes finish synchronously; nothing to wait for."""
+
+class LocalWriter:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path + '.part', 'wb')
+
+    def write(self, data):
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+        os.replace(self.path + '.part', self.path)
+        return self.path
+
+    def abort(self):
+        self._file.close()
+        os.unlink(self.path + '.part')
+
+class S3Sink:
+    """
+    Streams output into an S3-compatible bucket.
+
+    Part uploads run on a shared thread pool, so a download keeps receiving
+    data while earlier parts are in flight. Closing a writer or calling
+    put_file() returns immediately; wait() blocks until one object is stored,
+    when_stored() calls back once it is, and flush() waits for every pending
+    upload, raising the first error.
+    """
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None,
+                 part_size=DEFAULT_PART_SIZE, max_concurrency=4):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("S3 output needs boto3. Install it with:\n  pip install boto3")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        self.parts = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='s3-part')
+        # Completions and whole-file uploads wait on parts, so they get their own pool
+        self.uploads = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='s3-upload')
+        # Bound the parts buffered in memory per sink
+        self.slots = threading.Semaphore(max_concurrency * 2)
+        self._pending = {}  # s3:// location -> future of its upload
+        self._lock = threading.Lock()
+
+    def key(self, name):
+        name = name.replace(os.sep, '/').lstrip('/')
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def location(self, name):
+        return f"s3://{self.bucket}/{self.key(name)}"
+
+    def _track(self, location, future):
+        with self._lock:
+            self._pending[location] = future
+        return location
+
+    def open(self, name):
+        """
+        Open a streaming multipart writer for ``name``.
+
+        Returns:
+            S3Writer: The writer
+        """
+        return S3Writer(self, self.key(name))
+
+    def put_file(self, path, name=None, remove=True):
+        """
+        Upload a finished local file in the background.
+
+        Args:
+            path (str): The local file
+            name (str, optional): Object name below the prefix, defaults to the file name
+            remove (bool): Delete the local file once it is uploaded
+
+        Returns:
+            str: The object's s3:// location
+        """
+        name = name or os.path.basename(path)
+
+        def upload():
+            self.client.upload_file(path, self.bucket, self.key(name))
+            if remove:
+                os.unlink(path)
+
+        print(f"Uploading {path} to {self.location(name)}")
+        return self._track(self.location(name), self.uploads.submit(upload))
+
+    def wait(self, location):
+        """Wait until the object at ``location`` is stored, raising any upload error."""
+        with self._lock:
+            future = self._pending.pop(location, None)
+        if future is not None:
+            future.result()
+
+    def when_stored(self, location, callback):
+        """
+        Call ``callback(error)`` once the object at ``location`` is stored,
+        with the upload's exception or None. Runs on the upload thread, or
+        right away if nothing is pending.
+        """
+        with self._lock:
+            future = self._pending.pop(location, None)
+        if future is None:
+            callback(None)
+        else:
+            future.add_done_callback(lambda done: callback(done.exception()))
+
+    def flush(self):
+        """Wait for all pending uploads, raising the first error."""
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            for future in pending.values():
+                future.result()
+
+class S3Writer:
+    """File-like writer that streams into an S3 multipart upload."""
+
+    def __init__(self, sink, key):
+        self.sink = sink
+        self.key = key
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.part_futures = []
+
+    def write(self, data):
+        self.buffer.extend(data)
+        if len(self.buffer) >= self.sink.part_size:
+            self._send_part(bytes(self.buffer))
+            self.buffer = bytearray()
+
+    def _send_part(self, data):
+        sink = self.sink
+        if self.upload_id is None:
+            self.upload_id = sink.client.create_multipart_upload(Bucket=sink.bucket, Key=self.key)['UploadId']
+        upload_id = self.upload_id
+        part_number = len(self.part_futures) + 1
+        sink.slots.acquire()
+
+        def upload():
+            try:
+                response = sink.client.upload_part(
+                    Bucket=sink.bucket, Key=self.key, UploadId=upload_id,
+                    PartNumber=part_number, Body=data
+                )
+                return {'ETag': response['ETag'], 'PartNumber': part_number}
+            finally:
+                sink.slots.release()
+
+        self.part_futures.append(sink.parts.submit(upload))
+
+    def close(self):
+        """
+        Finish the object in the background.
+
+        Returns:
+            str: The object's s3:// location
+        """
+        sink = self.sink
+        location = f"s3://{sink.bucket}/{self.key}"
+        data, self.buffer = bytes(self.buffer), bytearray()
+        if self.upload_id is None:
+            # Small object: a single PUT is cheaper than a multipart upload
+            return sink._track(location, sink.uploads.submit(
+                sink.client.put_object, Bucket=sink.bucket, Key=self.key, Body=data
+            ))
+        if data:
+            self._send_part(data)
+        futures = list(self.part_futures)
+        upload_id = self.upload_id
+
+        def complete():
+            try:
+                parts = [future.result() for future in futures]
+            except Exception:
+                self.abort()
+                raise
+            sink.client.complete_multipart_upload(
+                Bucket=sink.bucket, Key=self.key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+
+        return sink._track(location, sink.uploads.submit(complete))
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.sink.client.abort_multipart_upload(Bucket=self.sink.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+def make_sink(s3_bucket=None, s3_prefix='', s3_endpoint=None, output_dir=None):
+    """
+    Build the sink described by command line options.
+
+    Returns:
+        LocalSink or S3Sink: S3 when a bucket is given, otherwise local files
+    """
+    if s3_bucket:
+        return S3Sink(s3_bucket, s3_prefix or '', endpoint_url=s3_endpoint)
+    return LocalSink(output_dir)
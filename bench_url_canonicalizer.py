@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for URL canonicalization and batch deduplication.
+
+Builds a synthetic corpus of YouTube and direct URLs in every supported shape,
+with duplicates and tracking noise, then times canonicalize_url and dedupe_urls.
+
+    python bench_url_canonicalizer.py             # one million URLs
+    python bench_url_canonicalizer.py -n 100000
+"""
+import time
+import random
+import argparse
+import string
+from audio_downloader import canonicalize_url, dedupe_urls
+
+YOUTUBE_TEMPLATES = [
+    "https://www.youtube.com/watch?v={id}",
+    "https://www.youtube.com/watch?v={id}&si={noise}",
+    "https://m.youtube.com/watch?v={id}&t={t}s",
+    "https://music.youtube.com/watch?v={id}&list=PL{noise}",
+    "https://youtu.be/{id}?si={noise}",
+    "youtu.be/{id}",
+    "https://www.youtube.com/shorts/{id}",
+    "https://www.youtube.com/embed/{id}?start={t}",
+    "https://www.youtube.com/live/{id}",
+    "https://youtube.com/v/{id}",
+]
+
+DIRECT_TEMPLATES = [
+    "https://cdn{n}.example.com/audio/{id}.mp3",
+    "HTTPS://CDN{n}.EXAMPLE.COM:443/audio/{id}.mp3#section",
+    "http://feeds.example.org/{id}/episode.m4a?token={noise}",
+]
+
+ALPHABET = string.ascii_letters + string.digits + "-_"
+
+def build_corpus(size, unique_ratio, seed):
+    """
+    Build a URL corpus where roughly ``unique_ratio`` of entries are distinct content.
+
+    Returns:
+        list: URLs
+    """
+    rng = random.Random(seed)
+    ids = ["".join(rng.choice(ALPHABET) for _ in range(11)) for _ in range(max(1, int(size * unique_ratio)))]
+    corpus = []
+    for _ in range(size):
+        content_id = rng.choice(ids)
+        templates = YOUTUBE_TEMPLATES if rng.random() < 0.8 else DIRECT_TEMPLATES
+        corpus.append(rng.choice(templates).format(
+            id=content_id,
+            noise="".join(rng.choice(ALPHABET) for _ in range(8)),
+            t=rng.randint(0, 3600),
+            n=rng.randint(1, 3),
+        ))
+    return corpus
+
+def timed(label, func, count):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed:8.3f} s  {count / elapsed:12,.0f} URLs/s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark URL canonicalization.')
+    parser.add_argument('-n', '--size', type=int, default=1000000, help='Number of URLs in the corpus')
+    parser.add_argument('--unique', type=float, default=0.25, help='Fraction of distinct content IDs')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed')
+    args = parser.parse_args()
+
+    corpus = timed("build corpus", lambda: build_corpus(args.size, args.unique, args.seed), args.size)
+    timed("canonicalize_url", lambda: [canonicalize_url(url) for url in corpus], args.size)
+    unique = timed("dedupe_urls", lambda: dedupe_urls(corpus), args.size)
+    print(f"{len(corpus):,} URLs -> {len(unique):,} distinct")
+
+if __name__ == "__main__":
+    main()